@@ -0,0 +1,273 @@
+import os, random, sqlite3, threading, time, uuid
+from collections import deque
+
+# ======================
+# Process-wide admission control for upstream LLM calls
+# ======================
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+THROTTLED_NAMES = {"ResourceExhausted", "TooManyRequests"}
+RETRYABLE_NAMES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+                   "DeadlineExceeded", "BadGateway", "GatewayTimeout"}
+
+class QueueFull(Exception):
+    pass
+
+class QueueTimeout(QueueFull):
+    # the caller's deadline passed while it waited for a slot, a shared flight or a retry
+    pass
+
+class Abandoned(Exception):
+    # raised by a flight leader that gave up (its session cancelled); followers don't get its partial
+    # result, one of them runs the call itself instead
+    pass
+
+def _left(deadline):
+    # deadlines are time.perf_counter() based, like planner.remaining()
+    return None if deadline is None else deadline - time.perf_counter()
+
+def is_retryable(e: Exception) -> bool:
+    # google.api_core errors carry .code, requests errors carry .response.status_code
+    code = getattr(e, "code", None)
+    if not isinstance(code, int):
+        code = getattr(getattr(e, "response", None), "status_code", None)
+    return code in RETRYABLE_STATUS or type(e).__name__ in RETRYABLE_NAMES
+
+def is_throttled(e: Exception) -> bool:
+    # 429 / quota: the upstream is up, we're just over our rate
+    code = getattr(e, "code", None)
+    if not isinstance(code, int):
+        code = getattr(getattr(e, "response", None), "status_code", None)
+    return code == 429 or type(e).__name__ in THROTTLED_NAMES
+
+class TokenBucket:
+    def __init__(self, rate_per_s: float, burst: int):
+        self.rate, self.capacity = rate_per_s, float(burst)
+        self.tokens, self.stamp = float(burst), time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        # blocks until a token is available; returns the time spent waiting
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def try_take(self) -> bool:
+        # non-blocking take, for optional extra calls (hedges) that should only use spare capacity
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens < 1: return False
+            self.tokens -= 1
+            return True
+
+class SharedLimits:
+    # the token bucket and a concurrency cap kept in one SQLite file, so every process on the same
+    # cache dir (the page, batch runs) spends one Gemini budget. Same take/try_take as TokenBucket.
+    # Slots carry a lease, so a process that dies holding one only blocks the others until it expires.
+    def __init__(self, path: str, rate_per_s: float, burst: int, max_concurrent: int, lease_s: float = 600.0):
+        self.rate, self.capacity, self.max_concurrent, self.lease_s = rate_per_s, float(burst), max_concurrent, lease_s
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS bucket (id INTEGER PRIMARY KEY, tokens REAL NOT NULL, stamp REAL NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS slots (id TEXT PRIMARY KEY, expires REAL NOT NULL)")
+        self._db.execute("INSERT OR IGNORE INTO bucket(id, tokens, stamp) VALUES(0, ?, ?)", (self.capacity, time.time()))
+
+    def _tx(self, fn):
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write is atomic across processes
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                out = fn(time.time())
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return out
+
+    def _take(self, now: float) -> float:
+        # -> 0 if a token was taken, else how long until one is due
+        tokens, stamp = self._db.execute("SELECT tokens, stamp FROM bucket WHERE id = 0").fetchone()
+        tokens = min(self.capacity, tokens + max(0.0, now - stamp) * self.rate)
+        taken = tokens >= 1
+        self._db.execute("UPDATE bucket SET tokens = ?, stamp = ? WHERE id = 0", (tokens - taken, now))
+        return 0.0 if taken else (1 - tokens) / self.rate
+
+    def take(self) -> float:
+        waited = 0.0
+        while True:
+            delay = self._tx(self._take)
+            if not delay: return waited
+            time.sleep(delay)
+            waited += delay
+
+    def try_take(self) -> bool:
+        return not self._tx(self._take)
+
+    def try_acquire(self):
+        # -> slot id, or None when max_concurrent calls are already out across all processes
+        def acquire(now):
+            self._db.execute("DELETE FROM slots WHERE expires < ?", (now,))
+            if self._db.execute("SELECT COUNT(*) FROM slots").fetchone()[0] >= self.max_concurrent: return None
+            slot = uuid.uuid4().hex
+            self._db.execute("INSERT INTO slots(id, expires) VALUES(?, ?)", (slot, now + self.lease_s))
+            return slot
+        return self._tx(acquire)
+
+    def release(self, slot: str):
+        with self._lock:
+            self._db.execute("DELETE FROM slots WHERE id = ?", (slot,))
+
+    def active(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM slots WHERE expires >= ?", (time.time(),)).fetchone()[0]
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result, self.error, self.followers = None, None, 0
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = 4, rate_per_s: float = 2.0, burst: int = 4, max_queue: int = 32,
+                 retries: int = 3, backoff_s: float = 1.0, max_backoff_s: float = 20.0, shared: SharedLimits = None):
+        self.max_concurrent, self.max_queue = max_concurrent, max_queue
+        self.retries, self.backoff_s, self.max_backoff_s = retries, backoff_s, max_backoff_s
+        # with shared limits the rate and the concurrency cap hold across processes, not just this one
+        self.shared = shared
+        self.bucket = shared or TokenBucket(rate_per_s, burst)
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._active = 0
+        self._flights = {}
+        self._stats = {"admitted": 0, "rejected": 0, "coalesced": 0, "retries": 0, "failures": 0, "timeouts": 0,
+                       "wait_total_s": 0.0, "wait_max_s": 0.0}
+
+    def run(self, key: str, fn, on_wait=None, deadline=None):
+        # single-flight: identical in-flight keys share one upstream call
+        while True:
+            with self._cond:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight()
+                else:
+                    flight.followers += 1
+                    self._stats["coalesced"] += 1
+            if leader: break
+            if on_wait: on_wait("🤝 Someone just asked for the same trip, sharing their plan...")
+            left = _left(deadline)
+            if not flight.done.wait(None if left is None else max(0.0, left)):
+                raise QueueTimeout("deadline passed while sharing another request's call")
+            if isinstance(flight.error, Abandoned): continue  # the leader gave up; take over or join the next one
+            if flight.error is not None: raise flight.error
+            return flight.result
+        try:
+            flight.result = self.call(fn, on_wait, deadline)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._cond:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def call(self, fn, on_wait=None, deadline=None):
+        self._enter(on_wait, deadline)
+        slot = None
+        try:
+            if self.shared: slot = self._shared_slot(on_wait, deadline)
+            for attempt in range(self.retries + 1):
+                self.bucket.take()
+                left = _left(deadline)
+                if left is not None and left <= 0:
+                    # no time left for even one call: fail here instead of calling without a timeout
+                    with self._cond: self._stats["timeouts"] += 1
+                    raise QueueTimeout("deadline passed before the call could start")
+                try:
+                    return fn()
+                except Abandoned:
+                    raise
+                except Exception as e:
+                    # full jitter keeps many sessions from retrying in lockstep
+                    delay = random.uniform(0, min(self.max_backoff_s, self.backoff_s * 2 ** attempt))
+                    left = _left(deadline)
+                    if attempt == self.retries or not is_retryable(e) or (left is not None and delay >= left):
+                        with self._cond: self._stats["failures"] += 1
+                        raise
+                    with self._cond: self._stats["retries"] += 1
+                    if on_wait: on_wait(f"🔁 Gemini is busy, retrying in {delay:.1f}s...")
+                    time.sleep(delay)
+        finally:
+            if slot: self.shared.release(slot)
+            self._leave()
+
+    def _shared_slot(self, on_wait, deadline):
+        # this process let us in; wait for the cap shared with other processes too
+        told = False
+        while True:
+            slot = self.shared.try_acquire()
+            if slot: return slot
+            left = _left(deadline)
+            if left is not None and left <= 0:
+                with self._cond: self._stats["timeouts"] += 1
+                raise QueueTimeout("deadline passed waiting for a shared Gemini slot")
+            if on_wait and not told:
+                on_wait("⏳ Other NomadSquad runs are using Gemini right now, waiting for a slot...")
+                told = True
+            time.sleep(0.2 if left is None else min(0.2, left))
+
+    def _enter(self, on_wait, deadline=None):
+        t0 = time.monotonic()
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise QueueFull(f"{len(self._queue)} requests already waiting")
+            ticket = object()
+            self._queue.append(ticket)
+            last = None
+            while self._queue[0] is not ticket or self._active >= self.max_concurrent:
+                pos = self._queue.index(ticket) + 1
+                if on_wait and pos != last:
+                    on_wait(f"⏳ Lots of travellers right now, you're #{pos} in line...")
+                    last = pos
+                left = _left(deadline)
+                if left is not None and left <= 0:
+                    self._queue.remove(ticket)
+                    self._stats["timeouts"] += 1
+                    self._cond.notify_all()  # whoever was behind us may be at the head now
+                    raise QueueTimeout(f"deadline passed at #{pos} in line")
+                self._cond.wait(0.5 if left is None else min(0.5, left))
+            self._queue.popleft()
+            self._active += 1
+            waited = time.monotonic() - t0
+            self._stats["admitted"] += 1
+            self._stats["wait_total_s"] += waited
+            self._stats["wait_max_s"] = max(self._stats["wait_max_s"], waited)
+            self._cond.notify_all()
+
+    def _leave(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            out = dict(self._stats)
+            out.update(queue_depth=len(self._queue), active=self._active, in_flight=len(self._flights))
+        if self.shared: out["shared_active"] = self.shared.active()
+        out["wait_avg_s"] = out["wait_total_s"] / out["admitted"] if out["admitted"] else 0.0
+        return out
@@ -1,8 +1,15 @@
 import streamlit as st
-import google.generativeai as genai
-import os, requests, datetime, io
-from PIL import Image, ImageDraw, ImageFont
+import copy, datetime, time
+from concurrent.futures import TimeoutError as FutureTimeout
 import urllib.parse as up
+from admission import QueueFull
+from long_trip import retry_failed, pending_blocks, stitch
+from itinerary_edit import split_blocks, edit_targets, edit_prompt, trip_inputs_block, splice
+from itinerary_doc import parse_itinerary
+from planner import (
+    Services, PLAN_DEADLINE_S, BUSY_MESSAGE, timed_call, remaining, build_prompt, plan_cache_key, research_links,
+    cached_plan, make_gemini_itinerary, long_trip_generator, generate_itinerary,
+)
 
 # ======================
 # Styling (your CSS kept)
@@ -91,182 +98,132 @@ except KeyError:
     st.error("GEMINI_API_KEY not found in .streamlit/secrets.toml")
     st.stop()
 
-PPLX_API_KEY = st.secrets.get("PPLX_API_KEY")
-EXCHANGE_RATE_API_KEY = st.secrets.get("EXCHANGE_RATE_API_KEY")
+@st.cache_resource
+def get_services():
+    # caches, queues, pools and clients shared by every session (and built the same way by batch.py)
+    return Services(st.secrets)
+
+svc = get_services()
 
 # ======================
 # SESSION STATE (PERSISTENCE)
 # ======================
-if "home_budget" not in st.session_state: st.session_state.home_budget = 2000
-if "exchange_rate" not in st.session_state: st.session_state.exchange_rate = 1.0
-if "dest_currency" not in st.session_state: st.session_state.dest_currency = "INR"
-if "home_currency" not in st.session_state: st.session_state.home_currency = "INR"
-if "dest_currency_select" not in st.session_state: st.session_state.dest_currency_select = "INR"
-
-# Persist generated outputs
-if "final_output" not in st.session_state: st.session_state.final_output = None
-if "links_output" not in st.session_state: st.session_state.links_output = []
+SESSION_DEFAULTS = {
+    "home_budget": 2000, "exchange_rate": 1.0, "dest_currency": "INR", "home_currency": "INR",
+    "dest_currency_select": "INR",
+    # generated outputs
+    "final_output": None, "links_output": [], "links_future": None, "links_timed_out": False,
+    "plan_deadline": 0.0, "stage_timings": {}, "job_id": None, "long_trip": None, "last_prompt": "",
+    "trip_destination": "",
+}
+for _k, _v in SESSION_DEFAULTS.items():
+    if _k not in st.session_state: st.session_state[_k] = copy.copy(_v)  # no shared lists/dicts between sessions
 
 # ======================
 # HELPERS
 # ======================
-@st.cache_data(ttl=3600)
 def get_exchange_rate(home_currency="INR", dest_currency="USD"):
-    if not EXCHANGE_RATE_API_KEY or home_currency == dest_currency:
-        return 1.0, dest_currency
-    url = f"https://v6.exchangerate-api.com/v6/{EXCHANGE_RATE_API_KEY}/pair/{home_currency}/{dest_currency}"
-    try:
-        r = requests.get(url, timeout=6); r.raise_for_status()
-        data = r.json()
-        if data.get("result") == "success": return data.get("conversion_rate", 1.0), dest_currency
-        st.warning("Could not fetch live exchange rate. Using 1.0")
-    except Exception:
-        st.warning("Network error fetching exchange rate. Using 1.0")
-    return 1.0, dest_currency
+    # -> (rate, dest); rate is None while there is no live rate (no key, or the first snapshot hasn't landed)
+    if home_currency == dest_currency: return 1.0, dest_currency
+    if not svc.exchange_rate_api_key: return None, dest_currency
+    return svc.rate_table.rate(home_currency, dest_currency), dest_currency
 
 def maps_search_url(query: str) -> str:
     return f"https://www.google.com/maps/search/?api=1&query={up.quote(query)}"
 
-def pplx_research(query:str, model:str="sonar-pro", k:int=8):
-    if not PPLX_API_KEY: return "", []
-    url = "https://api.perplexity.ai/chat/completions"
-    headers = {"Authorization": f"Bearer {PPLX_API_KEY}", "Content-Type":"application/json"}
-    payload = {
-        "model": model,  # "sonar-pro" (fast) or "sonar-deep-research" (deeper)
-        "messages": [
-            {"role":"system","content":"Be precise, add trustworthy links (official or major OTAs), concise bullets."},
-            {"role":"user","content": f"Find high-quality booking pages and review links: {query}. Prefer official hotel sites or major OTAs. 6–8 best links."}
-        ],
-        "temperature": 0.2,
-        "top_p": 0.9,
-        "max_tokens": 1200
-    }
-    try:
-        r = requests.post(url, headers=headers, json=payload, timeout=60)
-        r.raise_for_status()
-        js = r.json()
-        text = js["choices"][0]["message"]["content"]
-        results = js.get("search_results", []) or []
-        links = []
-        for it in results[:k]:
-            links.append({"title": it.get("title","Link"), "url": it.get("url","#"), "date": it.get("date","")})
-        return text, links
-    except Exception as e:
-        st.info(f"Perplexity research unavailable ({e})."); return "", []
-
-def make_gemini_itinerary(api_key, prompt):
-    try:
-        genai.configure(api_key=api_key)
-
-        # ✅ UPDATED: Using your available Gemini 3 Flash model
-        # This is the best balance of speed and intelligence for your app right now.
-        model_name = "models/gemini-3-flash-preview"
-        model = genai.GenerativeModel(model_name)
-
-        cfg = {
-            "max_output_tokens": 4096,  # Increased for detailed itineraries
-            "temperature": 0.7,
-            "top_p": 0.9
-        }
-
-        # Safety settings to prevent blocking of travel content
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-        ]
-
-        resp = model.generate_content(
-            prompt, 
-            generation_config=cfg,
-            safety_settings=safety_settings
-        )
-
-        if not resp or not getattr(resp, "text", None):
-            return None, "Empty response from Gemini."
-
-        return resp.text.strip(), None
-
-    except Exception as e:
-        # Debug block kept in case you ever need to check models again
-        try:
-            print(f"❌ Error with model '{model_name}': {e}")
-            print("🔍 Listing available models for your key...")
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    print(f"   - {m.name}")
-        except:
-            pass
-        return None, f"Gemini request failed: {e}"
-    
-
-# ---------- PDF generation using Pillow (no extra libs)
-def wrap_text_to_width(draw, text, font, max_width):
-    lines = []
-    for paragraph in text.split("\n"):
-        if not paragraph:
-            lines.append("")
-            continue
-        words = paragraph.split(" ")
-        line = ""
-        for w in words:
-            test = (line + " " + w).strip()
-            if draw.textlength(test, font=font) <= max_width:
-                line = test
-            else:
-                if line: lines.append(line)
-                line = w
-        if line: lines.append(line)
-    return lines
-
-def markdown_to_plain(md: str) -> str:
-    # quick-and-simple: strip ** and headings for readable PDF
-    lines = []
-    for raw in md.splitlines():
-        s = raw.replace("**","").replace("__","")
-        s = s.replace("###","").replace("##","").replace("#","").lstrip()
-        lines.append(s)
-    return "\n".join(lines)
-
-def build_pdf_bytes(markdown_text: str, title: str="NomadSquad Itinerary"):
-    W, H = 1240, 1754          # roughly A4 at ~150 DPI
-    M = 80
-    font_title = ImageFont.load_default()
-    font_body = ImageFont.load_default()
-
-    pages = []
-    text = f"{title}\n\n" + markdown_to_plain(markdown_text)
-
-    temp = Image.new("RGB", (W, H), "white")
-    draw_temp = ImageDraw.Draw(temp)
-
-    y = M
-    page = Image.new("RGB", (W, H), "white")
-    draw = ImageDraw.Draw(page)
-
-    # Title
-    for t in wrap_text_to_width(draw, title, font_title, W - 2*M):
-        draw.text((M, y), t, font=font_title, fill="black")
-        y += 28
-    y += 10
-
-    # Body
-    for line in wrap_text_to_width(draw_temp, text, font_body, W - 2*M):
-        if y > H - M:  # new page
-            pages.append(page)
-            page = Image.new("RGB", (W, H), "white")
-            draw = ImageDraw.Draw(page)
-            y = M
-        draw.text((M, y), line, font=font_body, fill="black")
-        y += 22
-
-    pages.append(page)
-
-    bio = io.BytesIO()
-    pages[0].save(bio, format="PDF", save_all=True, append_images=pages[1:])
-    bio.seek(0)
-    return bio
+# ---------- Background jobs: everything that waits on Gemini runs on the job pool
+def plan_job(job, prompt, duration, cache_key, stream, deadline, timings):
+    # -> {"text", "err", "plan", "timings"}; err next to text is a warning, err alone a failure
+    text, err, plan = generate_itinerary(
+        svc, prompt, duration, cache_key, deadline, timings, stream=stream,
+        note=lambda msg: job.update(note=msg), on_sections=lambda secs: job.update(sections=secs),
+        on_progress=lambda done, total: job.update(note=f"🗺️ Day blocks written: {done}/{total}", fraction=done / total),
+        cancelled=lambda: job.cancelled,
+    )
+    return {"text": text, "err": err, "plan": plan, "timings": timings}
+
+def edit_job(job, blocks, target, prompt):
+    new_text, err = make_gemini_itinerary(svc, prompt, lambda msg: job.update(note=msg),
+                                          deadline=time.perf_counter() + PLAN_DEADLINE_S)
+    return {"text": splice(blocks, target, new_text) if new_text else None, "err": err}
+
+def retry_job(job, plan, current):
+    # new day blocks go into the text on screen, so edits made since the plan came back survive.
+    # Works on a copy: the session's plan only changes when apply_job takes the result (not on cancel)
+    plan = copy.deepcopy(plan)
+    deadline = time.perf_counter() + PLAN_DEADLINE_S
+    text, _ = retry_failed(
+        plan, long_trip_generator(svc, deadline),
+        max_parallel=svc.long_trip_parallel, deadline=deadline,
+        on_progress=lambda done, total: job.update(note=f"🗺️ Missing days written: {done}/{total}", fraction=done / total),
+        current=current,
+    )
+    # blocks that failed again keep their placeholder and the warning; the cache keeps the unedited plan
+    if not plan["failed"] and not job.cancelled: svc.itinerary_cache.put(plan["cache_key"], stitch(plan))
+    return {"text": text, "err": None, "plan": plan}
+
+def apply_job(job):
+    # runs on the script thread once the job is over: moves its result into the session
+    res = job.result or {}
+    if job.cancelled:
+        if job.kind == "plan": st.session_state.links_future = None
+        st.info("Cancelled. Your previous plan is unchanged." if job.kind != "plan" else "Cancelled.")
+        return
+    if not res.get("text"):
+        if job.kind == "plan": st.session_state.links_future = None
+        st.error(f"Gemini Error: {res.get('err') or job.error or 'no answer'}")
+        return
+    if res.get("err"): st.warning(res["err"])
+    st.session_state.final_output = res["text"]
+    if "plan" in res: st.session_state.long_trip = res["plan"]
+    elif st.session_state.long_trip:
+        # an edit may have rewritten a placeholder; only the ones still on screen are left to retry
+        plan = st.session_state.long_trip
+        plan["failed"] = pending_blocks(plan, res["text"])
+    if job.kind == "plan":
+        st.session_state.stage_timings = res["timings"]
+        st.success("Trip generated! Scroll down to view.")
+
+JOB_LABELS = {"plan": "✨ NomadSquad is charting your adventure...", "edit": "✍️ Rewriting that part...",
+              "retry": "🗺️ Filling in the missing days..."}
+TAB_TITLES = ["Overview & Prep","Daily Adventure","Essential Tips","🔗 Book & Reviews"]
+
+@st.fragment(run_every=0.5)
+def job_status(job_id):
+    # polls the job store; the whole page reruns once the job lands
+    store = svc.job_store
+    job = store.get(job_id)
+    if job is None or job.finished or job.cancelled:
+        st.rerun()
+    info = job.snapshot()
+    if "fraction" in info: st.progress(info["fraction"], text=info.get("note"))
+    else: st.info(info.get("note") or JOB_LABELS.get(job.kind, "Working..."))
+    if info.get("sections"):
+        for tab, sec in zip(st.tabs(TAB_TITLES[:3]), info["sections"]):
+            tab.markdown(sec, unsafe_allow_html=True)
+    if st.button("✖️ Cancel", key=f"cancel_{job_id}"):
+        store.cancel(job_id)
+        st.rerun()
+
+@st.fragment(run_every=1.0)
+def links_status(fut, deadline):
+    if fut.done() or not remaining(deadline):
+        st.rerun()
+    st.info("🔎 Digging up booking & review links...")
+
+@st.fragment(run_every=1.0)
+def rates_status(home_currency, dest_currency):
+    # only shown while the first snapshot is missing; reruns the page once it lands
+    if svc.rate_table.rate(home_currency, dest_currency) is not None:
+        st.rerun()
+    st.caption("⏳ Live exchange rates are still loading...")
+
+@st.fragment(run_every=0.5)
+def pdf_build_status(pdf_cache, pdf_key):
+    # polls on its own so the rest of the page keeps working while a big PDF builds
+    if pdf_cache.get(pdf_key) is not None or pdf_cache.failed(pdf_key):
+        st.rerun()
+    st.caption("📄 Building your PDF in the background...")
 
 # ======================
 # UI: Title
@@ -274,214 +231,335 @@ def build_pdf_bytes(markdown_text: str, title: str="NomadSquad Itinerary"):
 st.title("✈️ NomadSquad")
 st.markdown("##### *Books in one hand, backpack in the other.*")
 st.markdown("---")
+st.sidebar.toggle("⚡ Stream the plan as it's written", value=True, key="stream_mode")
+cache_stats = svc.itinerary_cache.stats()
+st.sidebar.caption(
+    f"💾 Saved plans: {cache_stats['entries']} · {cache_stats['hits']} hits / {cache_stats['misses']} misses"
+)
+gate = svc.admission.stats()
+st.sidebar.caption(
+    f"🚦 Gemini queue: {gate['queue_depth']} waiting · {gate['active']} running · "
+    f"{gate['coalesced']} shared · avg wait {gate['wait_avg_s']:.1f}s"
+)
+idx = svc.link_index.stats()
+st.sidebar.caption(
+    f"🔗 Link index: {idx['links']} links · {idx['hit_rate']:.0%} served locally · "
+    f"{idx['lookup_avg_ms']:.1f} ms/lookup"
+)
+net = svc.http.stats()
+down = [ep for ep, v in net["endpoints"].items() if v["breaker"] != "closed"]
+reused = sum(p["requests"] - p["connections"] for p in net["pools"].values())
+st.sidebar.caption(
+    f"🔌 Outbound: {sum(p['requests'] for p in net['pools'].values())} requests · {reused} on reused connections"
+    + (f" · ⚠️ skipping {', '.join(down)}" if down else "")
+)
+
+# opt-in per session: stage latencies across all sessions, plus this session's last run
+if st.sidebar.toggle("🩺 Diagnostics", key="diagnostics"):
+    with st.sidebar.expander("Stage latencies (all sessions)", expanded=True):
+        ms = lambda v: f"{v * 1000:.0f} ms" if v is not None else "–"
+        stages = svc.metrics.stages()
+        if stages:
+            st.table([{"stage": name, "calls": v["count"], "p50": ms(v["p50_s"]), "p95": ms(v["p95_s"])}
+                      for name, v in stages.items()])
+        else:
+            st.caption("Nothing measured yet.")
+        mine = {k: v for k, v in st.session_state.stage_timings.items() if k != "start" and isinstance(v, float)}
+        if mine:
+            st.caption("This session: " + " · ".join(f"{k} {v:.2f}s" for k, v in mine.items()))
+        st.download_button("⬇️ Prometheus metrics", svc.metrics.prometheus(), file_name="nomadsquad.prom",
+                           mime="text/plain")
+
+# Reset button for a fresh run (sidebar widgets can't live inside a fragment)
+if st.session_state.final_output and st.sidebar.button("🔄 Reset Trip"):
+    if st.session_state.job_id: svc.job_store.cancel(st.session_state.job_id)
+    for _k in ("final_output", "links_output", "links_future", "stage_timings", "job_id", "long_trip"):
+        st.session_state[_k] = copy.copy(SESSION_DEFAULTS[_k])
+    st.rerun()
 
 # ======================
 # ORIGIN & BUDGET
 # ======================
-st.subheader("Your Origin & Budget 💸")
-col1, col2 = st.columns(2)
-with col1:
-    countries = ["India","USA","UK","Canada","Australia","Germany","France","Japan","Singapore","UAE","Thailand","Italy","Spain","Mexico","Brazil"]
-    origin_country = st.selectbox("🌍 Your Origin Country", countries, index=0, key='origin_country_sel')
-    currency_codes = ["INR","USD","EUR","GBP","CAD","AUD","JPY","SGD","AED","CHF","CNY","BRL","MXN","THB"]
-    st.session_state.home_currency = st.selectbox("🏠 Your Home Currency", currency_codes, index=0, key='home_currency_sel')
-with col2:
-    origin_city = st.text_input("🏙️ Your Origin City", placeholder="Enter Origin City...")
-    st.session_state.dest_currency_select = st.selectbox("💲 Destination Currency (for conversion)", currency_codes, index=1, key='dest_currency_selector')
-
-rate, actual_dest_code = get_exchange_rate(st.session_state.home_currency, st.session_state.dest_currency_select)
-st.session_state.exchange_rate = rate
-st.session_state.dest_currency = actual_dest_code
-
-max_budget_home = 50000 if st.session_state.home_currency != "JPY" else 5000000
-st.session_state.home_budget = st.slider(f"💰 Budget per person/day ({st.session_state.home_currency})", 100, max_budget_home, st.session_state.home_budget, 100)
-
-converted_budget = st.session_state.home_budget * st.session_state.exchange_rate
-st.markdown(f"👉 Approx. **{converted_budget:,.2f} {st.session_state.dest_currency}** per person/day")
-st.link_button("🗺️ Open Destination in Google Maps", maps_search_url(origin_city or "Your city"))
-st.markdown("---")
+# each block below is a fragment: touching a widget reruns only its own block
+@st.fragment
+def budget_block():
+    st.subheader("Your Origin & Budget 💸")
+    col1, col2 = st.columns(2)
+    with col1:
+        countries = ["India","USA","UK","Canada","Australia","Germany","France","Japan","Singapore","UAE","Thailand","Italy","Spain","Mexico","Brazil"]
+        st.selectbox("🌍 Your Origin Country", countries, index=0, key='origin_country_sel')
+        currency_codes = ["INR","USD","EUR","GBP","CAD","AUD","JPY","SGD","AED","CHF","CNY","BRL","MXN","THB"]
+        st.session_state.home_currency = st.selectbox("🏠 Your Home Currency", currency_codes, index=0, key='home_currency_sel')
+    with col2:
+        origin_city = st.text_input("🏙️ Your Origin City", placeholder="Enter Origin City...", key="origin_city")
+        st.session_state.dest_currency_select = st.selectbox("💲 Destination Currency (for conversion)", currency_codes, index=1, key='dest_currency_selector')
+
+    rate, actual_dest_code = get_exchange_rate(st.session_state.home_currency, st.session_state.dest_currency_select)
+    st.session_state.exchange_rate = rate
+    st.session_state.dest_currency = actual_dest_code
+
+    max_budget_home = 50000 if st.session_state.home_currency != "JPY" else 5000000
+    st.session_state.home_budget = st.slider(f"💰 Budget per person/day ({st.session_state.home_currency})", 100, max_budget_home, st.session_state.home_budget, 100)
+
+    if rate is None:
+        if svc.exchange_rate_api_key:
+            rates_status(st.session_state.home_currency, actual_dest_code)
+            reason = "No live rate yet"
+        else:
+            reason = "Currency conversion is off (no EXCHANGE_RATE_API_KEY)"
+        st.markdown(f"👉 {reason}, so NomadSquad plans with **{st.session_state.home_budget:,} "
+                    f"{st.session_state.home_currency}** per person/day")
+    else:
+        converted_budget = st.session_state.home_budget * rate
+        st.markdown(f"👉 Approx. **{converted_budget:,.2f} {st.session_state.dest_currency}** per person/day")
+    st.link_button("🗺️ Open Destination in Google Maps", maps_search_url(origin_city or "Your city"))
+    st.markdown("---")
+
+budget_block()
 
 # ======================
 # FORM
 # ======================
-with st.form("planner_form"):
-    st.header("Tell NomadSquad About Your Dream Trip! ✨")
-    destination = st.text_input("📍 Destination (City, Country)", placeholder="e.g., Paris, France")
-    duration = st.number_input("📅 Trip Duration (days)", min_value=1, max_value=30, value=5)
-    num_people = st.number_input("👥 Number of People", min_value=1, max_value=20, value=3)
-
-    st.subheader("Your Journey Details 🗓️")
-    c1, c2 = st.columns(2)
-    with c1:
-        transport_to_dest = st.selectbox("✈️ How are you arriving?", ["Airplane","Train","Car","Bus","Not Sure Yet"])
-    with c2:
-        current_month_index = datetime.datetime.now().month - 1
-        months = ["January","February","March","April","May","June","July","August","September","October","November","December"]
-        travel_month = st.selectbox("📅 Month of Travel", months, index=current_month_index)
-
-    st.subheader("Your Perfect Vibe ✨")
-    travel_vibe = st.multiselect(
-        "🌈 Select your vibe(s):",
-        ["🎉 Party & Nightlife","🧘 Relax & Recharge","⛪ Culture & History","🏞️ Adventure & Outdoors",
-         "🍽️ Foodie Heaven","🛍️ Shopping Spree","💎 Offbeat & Hidden Gems","📸 Picture Perfect Spots",
-         "🎭 Arts & Theatre","👩‍💻 Digital Nomad Work Spots","👨‍👩‍👧‍👦 Family Friendly Fun","💖 Romantic Getaway"]
-    )
+@st.fragment
+def planner_form():
+    with st.form("planner_form"):
+        st.header("Tell NomadSquad About Your Dream Trip! ✨")
+        destination = st.text_input("📍 Destination (City, Country)", placeholder="e.g., Paris, France")
+        duration = st.number_input("📅 Trip Duration (days)", min_value=1, max_value=30, value=5)
+        num_people = st.number_input("👥 Number of People", min_value=1, max_value=20, value=3)
+
+        st.subheader("Your Journey Details 🗓️")
+        c1, c2 = st.columns(2)
+        with c1:
+            transport_to_dest = st.selectbox("✈️ How are you arriving?", ["Airplane","Train","Car","Bus","Not Sure Yet"])
+        with c2:
+            current_month_index = datetime.datetime.now().month - 1
+            months = ["January","February","March","April","May","June","July","August","September","October","November","December"]
+            travel_month = st.selectbox("📅 Month of Travel", months, index=current_month_index)
+
+        st.subheader("Your Perfect Vibe ✨")
+        travel_vibe = st.multiselect(
+            "🌈 Select your vibe(s):",
+            ["🎉 Party & Nightlife","🧘 Relax & Recharge","⛪ Culture & History","🏞️ Adventure & Outdoors",
+             "🍽️ Foodie Heaven","🛍️ Shopping Spree","💎 Offbeat & Hidden Gems","📸 Picture Perfect Spots",
+             "🎭 Arts & Theatre","👩‍💻 Digital Nomad Work Spots","👨‍👩‍👧‍👦 Family Friendly Fun","💖 Romantic Getaway"]
+        )
 
-    col_style1, col_style2 = st.columns(2)
-    with col_style1:
-        accommodation = st.multiselect(
-            "🏨 Preferred Stay:",
-            ["hostels (Social & Budget)","budget hotels (Private & Basic)","guesthouses/Homestays (Local Feel)",
-             "mid-range hotels (Comfort)","boutique hotels (Stylish)","luxury resorts (Pampering)",
-             "airbnb/Apartments (Independent)","unique Stays (Treehouse, Boat etc.)"]
+        col_style1, col_style2 = st.columns(2)
+        with col_style1:
+            accommodation = st.multiselect(
+                "🏨 Preferred Stay:",
+                ["hostels (Social & Budget)","budget hotels (Private & Basic)","guesthouses/Homestays (Local Feel)",
+                 "mid-range hotels (Comfort)","boutique hotels (Stylish)","luxury resorts (Pampering)",
+                 "airbnb/Apartments (Independent)","unique Stays (Treehouse, Boat etc.)"]
+            )
+        with col_style2:
+            pace = st.radio("🏃 Travel Pace", ["🐢 Very Slow","🚶 Relaxed","🏃 Moderate","💨 Fast"], horizontal=True)
+
+        food_prefs = st.multiselect(
+            "🍜 Food Preferences?",
+            ["Vegetarian","Vegan","Pescatarian","Gluten-Free","local cuisine MUST!","street food addict",
+             "fine dining lover","must try desserts","café hopping culture","avoid spicy food"]
+        )
+        transport_prefs_local = st.selectbox(
+            "🛵 Preferred Local Transport?",
+            ["Scooter/Bike Rental","Car Rental (Self-Drive)","Taxis/Ride-Sharing (Uber/Grab etc)","Auto Rickshaws/Tuk-Tuks",
+             "Public Transport (Bus/Metro/Train)","Walking Focus"]
         )
-    with col_style2:
-        pace = st.radio("🏃 Travel Pace", ["🐢 Very Slow","🚶 Relaxed","🏃 Moderate","💨 Fast"], horizontal=True)
 
-    food_prefs = st.multiselect(
-        "🍜 Food Preferences?",
-        ["Vegetarian","Vegan","Pescatarian","Gluten-Free","local cuisine MUST!","street food addict",
-         "fine dining lover","must try desserts","café hopping culture","avoid spicy food"]
-    )
-    transport_prefs_local = st.selectbox(
-        "🛵 Preferred Local Transport?",
-        ["Scooter/Bike Rental","Car Rental (Self-Drive)","Taxis/Ride-Sharing (Uber/Grab etc)","Auto Rickshaws/Tuk-Tuks",
-         "Public Transport (Bus/Metro/Train)","Walking Focus"]
-    )
+        with st.popover("Advanced filters"):
+            min_rating = st.slider("Minimum hotel rating", 3.0, 5.0, 4.2, 0.1)
+            must_have = st.multiselect("Must-have amenities", ["Wi-Fi","Breakfast","Pool","Kitchen","Gym"])
 
-    with st.popover("Advanced filters"):
-        min_rating = st.slider("Minimum hotel rating", 3.0, 5.0, 4.2, 0.1)
-        must_have = st.multiselect("Must-have amenities", ["Wi-Fi","Breakfast","Pool","Kitchen","Gym"])
+        special_requests = st.text_area("📝 Any Special Requests / Must-See Places?",
+                                        placeholder="e.g., 'Eiffel Tower at night', 'Accessible temples', 'Surfing only'")
 
-    special_requests = st.text_area("📝 Any Special Requests / Must-See Places?",
-                                    placeholder="e.g., 'Eiffel Tower at night', 'Accessible temples', 'Surfing only'")
+        fresh_plan = st.checkbox("🔁 Skip saved plans (always generate a fresh one)", value=False)
 
-    submitted = st.form_submit_button("🚀 Generate My Epic Trip Plan!")
+        submitted = st.form_submit_button("🚀 Generate My Epic Trip Plan!")
 
-# ======================
-# PROMPT (funny + lingo + month packing)
-# ======================
-def build_prompt(destination, duration, people, budget_dest_currency, dest_currency_code, travel_vibe, accommodation, pace,
-                 origin_country, origin_city, transport_to_dest, travel_month, food_prefs, transport_prefs_local, special_requests):
-    accomm_str = ", ".join(accommodation) if accommodation else "Any suitable"
-    vibe_str   = ", ".join(travel_vibe) if travel_vibe else "General Tourist"
-    food_str   = ", ".join(food_prefs) if food_prefs else "No specific preferences"
-    prompt = (
-        f"You are NomadSquad, an adventurous, witty, emoji-loving travel planner. Lean funny and friendly.\n"
-        f"Add plenty of destination lingo and local slang with brief meanings (5–10 phrases sprinkled naturally).\n"
-        f"Include playful jokes and hype, but stay practical and accurate.\n"
-        f"--- TRIP INPUTS ---\n"
-        f"Origin: {origin_city}, {origin_country}\n"
-        f"Destination: {destination}\n"
-        f"Month: {travel_month}\n"
-        f"Duration: {duration} days\n"
-        f"People: {people}\n"
-        f"Daily Budget (per person): {budget_dest_currency:.0f} {dest_currency_code}\n"
-        f"Arrival: {transport_to_dest}\n"
-        f"Stay: {accomm_str}\n"
-        f"Vibe: {vibe_str}\n"
-        f"Pace: {pace}\n"
-        f"Food: {food_str}\n"
-        f"Local Transport Pref: {transport_prefs_local}\n"
-        f"Requests: {special_requests or 'None'}\n"
-        f"--- RULES ---\n"
-        f"1) In the OVERVIEW, give seasonal/weather context for {destination} in {travel_month} (°C), "
-        f"and a concise PACKING LIST tailored to the season (e.g., rain gear in monsoon, layers in winter, sunscreen in summer).\n"
-        f"2) DAILY ITINERARY: Write a vivid day-by-day plan (**Day 1**, **Day 2**, ...). Blend vibes & requests; be descriptive and fun.\n"
-        f"3) TIPS: Include arrival & local transport guidance, safety, budget hacks, and a 'Local Lingo' mini-glossary "
-        f"(5–10 short entries: phrase = meaning + when to use).\n"
-        f"4) FOOD: Suggest specific eateries/dishes respecting preferences; add price hints in {dest_currency_code}.\n"
-        f"5) ACCOMMODATION: Suggest 1–2 options that match style & budget with brief WHY they fit.\n"
-        f"6) Keep it structured EXACTLY in these headings:\n"
-        f"### 🎉 Your NomadSquad Trip Overview & Seasonal Intel! 🎉\n"
-        f"### 🗺️ Your Awesome {duration}-Day Adventure Itinerary! 🗺️\n"
-        f"### ✨ NomadSquad's Pro Tips & Essential Info! ✨\n"
-        f"End each section with one fun one-liner in local flavor."
-    )
-    return prompt
+    # ---------- GENERATE (writes to session_state)
+    if submitted:
+        if not destination:
+            st.error("🚨 Please enter a destination.")
+        else:
+            # read again: the snapshot may have landed since the budget block last ran
+            rate, dest_code = get_exchange_rate(st.session_state.home_currency, st.session_state.dest_currency_select)
+            if rate is None:
+                # never label an unconverted amount with the destination currency
+                budget_for_ai, dest_currency_for_ai = st.session_state.home_budget, st.session_state.home_currency
+            else:
+                budget_for_ai, dest_currency_for_ai = st.session_state.home_budget * rate, dest_code
 
-# ======================
-# GENERATE (writes to session_state)
-# ======================
-if submitted:
-    if not destination:
-        st.error("🚨 Please enter a destination.")
-    else:
-        budget_for_ai = st.session_state.home_budget * st.session_state.exchange_rate
-        dest_currency_for_ai = st.session_state.dest_currency
+            # Perplexity doesn't depend on the itinerary, so both calls start together
+            t_start = time.perf_counter()
+            deadline = t_start + PLAN_DEADLINE_S
 
-        with st.spinner("✨ NomadSquad is charting your adventure..."):
-            prompt = build_prompt(
+            trip_inputs = (
                 destination, duration, num_people, budget_for_ai, dest_currency_for_ai,
-                travel_vibe, accommodation, pace, origin_country, origin_city,
-                transport_to_dest, travel_month, food_prefs, transport_prefs_local, special_requests
+                travel_vibe, accommodation, pace,
+                st.session_state.origin_country_sel, st.session_state.origin_city, transport_to_dest, travel_month,
+                food_prefs, transport_prefs_local, special_requests
+            )
+            cache_key = plan_cache_key(trip_inputs)
+
+            prompt, prompt_s = timed_call(build_prompt, *trip_inputs)
+            svc.metrics.observe("build_prompt", prompt_s)
+            st.session_state.last_prompt = prompt
+            st.session_state.trip_destination = destination
+            timings = {"prompt": prompt_s, "start": t_start}
+            if st.session_state.job_id: svc.job_store.cancel(st.session_state.job_id)  # a new submit replaces it
+            st.session_state.job_id = None
+            st.session_state.long_trip = None
+            pplx_fut = svc.worker_pool.submit(
+                timed_call, research_links, svc, destination, accommodation, min_rating, must_have
             )
-            gem_text, gem_err = make_gemini_itinerary(GEMINI_API_KEY, prompt)
-            if gem_err:
-                st.error(f"Gemini Error: {gem_err}")
+            # ---- PERSIST ----
+            # links are collected by the render block, so the itinerary shows up right away
+            st.session_state.links_output = []
+            st.session_state.links_future = pplx_fut
+            st.session_state.links_timed_out = False
+            st.session_state.plan_deadline = deadline
+            cached = None if fresh_plan else cached_plan(svc, cache_key)
+            if cached:
+                timings.update(gemini=0.0, first_content=time.perf_counter() - t_start, cached=True)
+                st.session_state.final_output = cached
+                st.session_state.stage_timings = timings
+                st.rerun()  # the results block lives in another fragment
             else:
-                # Perplexity research (optional, shows links)
-                research_query = f"{destination} best {(', '.join(accommodation) or 'hotels')} near top sights, " \
-                                 f"booking pages and review links; min rating {min_rating}; must-have {', '.join(must_have) or 'none'}"
-                _, links = pplx_research(research_query, model="sonar-pro")
-
-                # ---- PERSIST ----
-                st.session_state.final_output = gem_text
-                st.session_state.links_output = links
-
-                st.success("Trip generated! Scroll down to view.")
+                try:
+                    job = svc.job_store.submit(
+                        "plan", plan_job, prompt, duration, cache_key, st.session_state.stream_mode, deadline, timings
+                    )
+                    st.session_state.final_output = None
+                    st.session_state.job_id = job.id
+                    st.rerun()
+                except QueueFull:
+                    pplx_fut.cancel()
+                    st.session_state.links_future = None
+                    st.error(f"Gemini Error: {BUSY_MESSAGE}")
+
+planner_form()
 
 # ======================
-# RENDER FROM SESSION (persists across reruns)
+# RESULTS
 # ======================
-if st.session_state.final_output:
-    st.markdown("---")
-    st.subheader("🎉 Your Awesome Personalized Travel Plan is Ready! 🎉")
-
-    # Tabs: Overview / Itinerary / Tips / Links
-    tab_titles = ["Overview & Prep","Daily Adventure","Essential Tips","🔗 Book & Reviews"]
-    t1, t2, t3, t4 = st.tabs(tab_titles)
-
-    raw = st.session_state.final_output
-    links = st.session_state.links_output or []
-
-    # split by headers
-    overview, itinerary, tips = "", "", ""
-    if "### 🎉 Your NomadSquad Trip Overview" in raw and "### 🗺️" in raw:
-        overview = raw.split("### 🗺️",1)[0].split("### 🎉",1)[-1]
-        rest = "### 🗺️" + raw.split("### 🗺️",1)[1]
-        if "### ✨" in rest:
-            itinerary = rest.split("### ✨",1)[0]
-            tips = "### ✨" + rest.split("### ✨",1)[1]
-        else:
-            itinerary = rest
-
-    with t1: st.markdown(overview or raw, unsafe_allow_html=True)
-    with t2: st.markdown(itinerary or raw, unsafe_allow_html=True)
-    with t3: st.markdown(tips or raw, unsafe_allow_html=True)
-    with t4:
-        if links:
-            for it in links:
-                st.markdown(f"- [{it['title']}]({it['url']})  _{it.get('date','')}_")
+@st.fragment
+def results_block():
+    # ---------- background job (plan / edit / retry): picked up on whichever rerun sees it finish
+    if st.session_state.job_id:
+        job = svc.job_store.get(st.session_state.job_id)
+        if job is None:
+            st.session_state.job_id = None
+            st.warning("That request expired before it was picked up. Please try again.")
+        elif job.finished or job.cancelled:
+            st.session_state.job_id = None
+            apply_job(job)
         else:
-            st.info("No external links were added. Try again later or adjust filters.")
-
-    # Quick actions
-    st.markdown("### Actions")
-    st.link_button("🗺️ Open Destination in Google Maps", maps_search_url(destination or ""))
-    pdf_bytes = build_pdf_bytes(raw, title=f"NomadSquad — {destination or 'Trip'}")
-    st.download_button(
-        "⬇️ Download Itinerary (PDF)",
-        data=pdf_bytes,
-        file_name=f"NomadSquad_{(destination or 'Trip').replace(',','').replace(' ','_')}.pdf",
-        mime="application/pdf"
-    )
+            job_status(job.id)
+
+    # ---------- render from session (persists across reruns)
+    if st.session_state.final_output:
+        st.markdown("---")
+        st.subheader("🎉 Your Awesome Personalized Travel Plan is Ready! 🎉")
+
+        # Tabs: Overview / Itinerary / Tips / Links
+        t1, t2, t3, t4 = st.tabs(TAB_TITLES)
+
+        slots = [t.empty() for t in (t1, t2, t3)]
+        links = st.session_state.links_output or []
+
+        raw = st.session_state.final_output
+
+        # parsed once per output and reused by the tabs, the editor and the PDF
+        parsed_before = parse_itinerary.cache_info().misses
+        doc, parse_s = timed_call(parse_itinerary, raw)
+        if parse_itinerary.cache_info().misses > parsed_before: svc.metrics.observe("parse", parse_s)  # skip cache hits
+        for slot, key in zip(slots, ("overview", "itinerary", "tips")):
+            if not doc.structured:
+                slot.markdown(raw, unsafe_allow_html=True)
+            elif doc.section_markdown(key):
+                slot.markdown(doc.section_markdown(key), unsafe_allow_html=True)
+            else:
+                slot.info("This part didn't come through this time. Try ✏️ editing the plan below.")
+        with t4:
+            fut = st.session_state.links_future
+            if fut is not None and (fut.done() or not remaining(st.session_state.plan_deadline)):
+                timings = st.session_state.stage_timings
+                try:
+                    (source, links), timings["perplexity"] = fut.result(timeout=0)
+                    timings["links_indexed"] = source == "index"
+                except FutureTimeout:
+                    links = []
+                    st.session_state.links_timed_out = True
+                timings["total"] = time.perf_counter() - timings.pop("start")
+                st.session_state.links_output = links
+                st.session_state.links_future = None
+
+            if st.session_state.links_future is not None:
+                links_status(st.session_state.links_future, st.session_state.plan_deadline)
+            elif links:
+                for it in links:
+                    st.markdown(f"- [{it['title']}]({it['url']})  _{it.get('date','')}_")
+            elif st.session_state.links_timed_out:
+                st.info(f"Link research didn't finish within {PLAN_DEADLINE_S}s. Try again later or adjust filters.")
+            else:
+                st.info("No external links were added. Try again later or adjust filters.")
+
+        timings = st.session_state.stage_timings
+        if "total" in timings:
+            fmt = lambda k: f"{timings[k]:.1f}s" if timings.get(k) is not None else "timed out"
+            st.caption(
+                f"⏱️ Prompt {fmt('prompt')} · first content {fmt('first_content')} · "
+                f"Gemini {'cached' if timings.get('cached') else fmt('gemini')} · "
+                f"Perplexity {'indexed' if timings.get('links_indexed') else fmt('perplexity')} · "
+                f"wall clock {fmt('total')}"
+            )
 
-    # Reset button for a fresh run
-    if st.sidebar.button("🔄 Reset Trip"):
-        st.session_state.final_output = None
-        st.session_state.links_output = []
-        st.experimental_rerun()
+        busy = bool(st.session_state.job_id)  # one edit / retry at a time
+        plan = st.session_state.long_trip
+        if plan and plan["failed"]:
+            st.warning(f"{len(plan['failed'])} day block(s) didn't come back.")
+            if st.button("🔁 Retry missing days", disabled=busy):
+                st.session_state.job_id = svc.job_store.submit("retry", retry_job, plan, raw).id
+                st.rerun()
+
+        with st.expander("✏️ Edit a day or section"):
+            blocks = split_blocks(raw)
+            with st.form("edit_form"):
+                target = st.selectbox("Which part?", edit_targets(blocks))
+                instruction = st.text_input("What should change?", placeholder="e.g. 'more street food', 'swap the museum for a hike'")
+                rewrite = st.form_submit_button("✍️ Rewrite just this part", disabled=busy)
+            if rewrite and target:
+                # only the target block goes out in full; the rest travels as one-line summaries
+                prompt = edit_prompt(trip_inputs_block(st.session_state.last_prompt), blocks, target, instruction)
+                st.session_state.job_id = svc.job_store.submit("edit", edit_job, blocks, target, prompt).id
+                st.rerun()
+
+        # Quick actions
+        st.markdown("### Actions")
+        destination = st.session_state.trip_destination
+        st.link_button("🗺️ Open Destination in Google Maps", maps_search_url(destination or ""))
+        pdf_title = f"NomadSquad — {destination or 'Trip'}"
+        pdf_cache = svc.pdf_cache
+        pdf_key = pdf_cache.key(raw, pdf_title)
+        pdf_data = pdf_cache.get(pdf_key)
+        if pdf_data is None and (pdf_cache.pending(pdf_key) or st.button(
+                "🔁 Try the PDF again" if pdf_cache.failed(pdf_key) else "📄 Prepare PDF")):
+            try:
+                pdf_data = pdf_cache.request(raw, pdf_title).result(timeout=0.5)  # most plans are ready by now
+            except FutureTimeout:
+                pdf_build_status(pdf_cache, pdf_key)
+            except Exception:
+                st.rerun()  # the failure is recorded; the next run shows it with a retry button
+        if pdf_data is None and pdf_cache.failed(pdf_key):
+            st.error(f"Couldn't build the PDF: {pdf_cache.failed(pdf_key)}")
+        if pdf_data is not None:
+            st.download_button(
+                "⬇️ Download Itinerary (PDF)",
+                data=pdf_data,
+                file_name=f"NomadSquad_{(destination or 'Trip').replace(',','').replace(' ','_')}.pdf",
+                mime="application/pdf"
+            )
 
-    # OPTIONAL: If you want to stop execution after rendering to avoid extra reruns:
-    st.stop()
+results_block()
@@ -0,0 +1,175 @@
+# ======================
+# Headless batch planning: python batch.py trips.jsonl -o plans.jsonl --parallel 4 --pdf-dir pdfs/
+# Input rows use the build_prompt field names (CSV list fields are ';'-separated). Results are
+# appended as they finish; rows already "ok" in the output are skipped, so re-running resumes.
+# ======================
+import argparse, csv, json, os, sys, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from planner import (
+    Services, TRIP_FIELDS, PLAN_DEADLINE_S, load_settings, build_prompt, plan_cache_key, research_links,
+    generate_itinerary, build_pdf, timed_call, cached_plan,
+)
+
+LIST_FIELDS = {"travel_vibe", "accommodation", "food_prefs", "must_have"}
+DEFAULTS = {
+    "duration": 5, "people": 2, "budget_dest_currency": 100, "dest_currency_code": "USD", "travel_vibe": [],
+    "accommodation": [], "pace": "🚶 Relaxed", "origin_country": "", "origin_city": "", "transport_to_dest": "Airplane",
+    "travel_month": "", "food_prefs": [], "transport_prefs_local": "Public Transport (Bus/Metro/Train)",
+    "special_requests": "", "min_rating": 4.2, "must_have": [],  # the last two only steer link research
+}
+
+def parse_spec(row) -> dict:
+    # raises ValueError saying what is wrong with the row
+    if not isinstance(row, dict): raise ValueError("not an object")
+    spec = dict(DEFAULTS)
+    spec.update({k: v for k, v in row.items() if v not in (None, "")})
+    if not str(spec.get("destination", "")).strip(): raise ValueError("missing destination")
+    for k in LIST_FIELDS:
+        if isinstance(spec[k], str): spec[k] = [x.strip() for x in spec[k].split(";") if x.strip()]
+    for k, cast, low in (("duration", int, 1), ("people", int, 1), ("budget_dest_currency", float, 0.01),
+                         ("min_rating", float, 0)):
+        try:
+            spec[k] = cast(spec[k])
+        except (TypeError, ValueError):
+            raise ValueError(f"bad {k}: {spec[k]!r}") from None
+        if spec[k] < low: raise ValueError(f"bad {k}: {spec[k]!r}")
+    return spec
+
+def read_specs(path: str):
+    # -> (specs, errors); a bad row becomes an error record instead of stopping the run
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = [(i, row) for i, row in enumerate(csv.DictReader(f), 2)]  # line 1 is the header
+        else:
+            rows = [(i, line) for i, line in enumerate(f, 1) if line.strip()]
+    specs, errors = [], []
+    for line_no, row in rows:
+        try:
+            if isinstance(row, str):
+                try: row = json.loads(row)
+                except ValueError: raise ValueError("not valid JSON") from None
+            specs.append(parse_spec(row))
+        except ValueError as e:
+            rid = row.get("id") if isinstance(row, dict) else None
+            errors.append({"id": str(rid or f"line-{line_no}"), "status": "error", "error": f"line {line_no}: {e}"})
+    return specs, errors
+
+def trip_inputs(spec) -> tuple:
+    return tuple(spec[k] for k in TRIP_FIELDS)
+
+def row_id(spec) -> str:
+    # an explicit id wins; otherwise the cache key, so the same trip resumes under the same id
+    return str(spec.get("id") or plan_cache_key(trip_inputs(spec)))
+
+def recorded_ids(path: str) -> tuple:
+    # -> (ids marked ok, every id with a record)
+    done, seen = set(), set()
+    if not os.path.exists(path): return done, seen
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try: rec = json.loads(line)
+            except ValueError: continue  # a line cut short by an interrupted run
+            seen.add(rec.get("id"))
+            if rec.get("status") == "ok": done.add(rec["id"])
+    return done, seen
+
+def plan_one(svc, spec, links: bool, fresh: bool, pdf_dir: str, deadline_s: float):
+    t0 = time.perf_counter()
+    rid = row_id(spec)
+    inputs = trip_inputs(spec)
+    prompt, prompt_s = timed_call(build_prompt, *inputs)
+    svc.metrics.observe("build_prompt", prompt_s)
+    cache_key = plan_cache_key(inputs)
+    # links and the itinerary run side by side, as on the page
+    links_fut = svc.worker_pool.submit(
+        research_links, svc, spec["destination"], spec["accommodation"], spec["min_rating"], spec["must_have"]
+    ) if links else None
+    cached = None if fresh else cached_plan(svc, cache_key)
+    if cached:
+        text, err, plan = cached, None, None
+    else:
+        text, err, plan = generate_itinerary(svc, prompt, spec["duration"], cache_key,
+                                             time.perf_counter() + deadline_s, {})
+    rec = {"id": rid, "destination": spec["destination"], "duration": spec["duration"],
+           "travel_month": spec["travel_month"], "cached": bool(cached)}
+    if not text:
+        if links_fut: links_fut.cancel()
+        rec.update(status="error", error=err, elapsed_s=round(time.perf_counter() - t0, 2))
+        return rec
+    rec.update(status="ok", itinerary=text, warning=err, missing_days=plan["failed"] if plan else [])
+    if links_fut:
+        source, rec["links"] = links_fut.result()
+        rec["links_indexed"] = source == "index"
+    if pdf_dir:
+        path = os.path.join(pdf_dir, f"{rid}.pdf")
+        with open(path, "wb") as f:
+            f.write(build_pdf(svc, text, f"NomadSquad — {spec['destination']}"))
+        rec["pdf"] = path
+    rec["elapsed_s"] = round(time.perf_counter() - t0, 2)
+    return rec
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate NomadSquad itineraries in bulk.")
+    ap.add_argument("input", help="trip specs, .jsonl or .csv")
+    ap.add_argument("-o", "--output", default="plans.jsonl", help="results JSONL; also the resume checkpoint")
+    ap.add_argument("--parallel", type=int, default=4, help="trips in flight at once")
+    ap.add_argument("--pdf-dir", help="also write one PDF per trip here")
+    ap.add_argument("--no-links", action="store_true", help="skip Perplexity research")
+    ap.add_argument("--fresh", action="store_true", help="ignore saved plans")
+    ap.add_argument("--deadline", type=float, default=PLAN_DEADLINE_S * 2, help="seconds per trip")
+    ap.add_argument("--metrics", help="write stage latency histograms here when done (.prom or .json)")
+    ap.add_argument("--secrets", default=None, help="secrets.toml path (env vars of the same name override it)")
+    args = ap.parse_args(argv)
+
+    settings = load_settings(args.secrets) if args.secrets else load_settings()
+    if not settings.get("GEMINI_API_KEY"):
+        ap.error("GEMINI_API_KEY not set (secrets.toml or environment)")
+    # same settings and cache dir as the page, so Gemini's rate and concurrency limits are shared with it
+    # (they live in CACHE_DIR/limits.sqlite unless GEMINI_SHARED_LIMITS is false)
+    svc = Services(settings)
+    if args.pdf_dir: os.makedirs(args.pdf_dir, exist_ok=True)
+
+    specs, bad = read_specs(args.input)
+    done, seen = recorded_ids(args.output)
+    todo = [s for s in specs if row_id(s) not in done]
+    new_bad = [rec for rec in bad if rec["id"] not in seen]  # already reported by an earlier run
+    print(f"{len(specs) + len(bad)} trips, {len(specs) - len(todo)} already done, {len(bad)} invalid, "
+          f"{len(todo)} to go", file=sys.stderr)
+
+    write_lock = threading.Lock()
+    ok, failed = 0, len(new_bad)
+    if new_bad:
+        with open(args.output, "a", encoding="utf-8") as out:
+            for rec in new_bad:
+                out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                print(f"skipped {rec['id']}: {rec['error']}", file=sys.stderr)
+    ex = ThreadPoolExecutor(max_workers=max(1, args.parallel), thread_name_prefix="nomadsquad-batch")
+    futs = {ex.submit(plan_one, svc, s, not args.no_links, args.fresh, args.pdf_dir, args.deadline): s for s in todo}
+    try:
+        with open(args.output, "a", encoding="utf-8") as out:
+            for fut in as_completed(futs):
+                try:
+                    rec = fut.result()
+                except Exception as e:
+                    spec = futs[fut]
+                    rec = {"id": row_id(spec), "destination": spec["destination"], "status": "error", "error": str(e)}
+                with write_lock:
+                    out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                    out.flush()
+                    os.fsync(out.fileno())  # each finished row is a checkpoint
+                ok, failed = ok + (rec["status"] == "ok"), failed + (rec["status"] != "ok")
+                print(f"[{ok + failed}/{len(todo) + len(new_bad)}] {rec['status']:5} {rec.get('destination', '')} "
+                      f"{rec.get('error') or ''}", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("interrupted; finished rows are saved, run the same command to resume", file=sys.stderr)
+        ex.shutdown(wait=False, cancel_futures=True)
+        if args.metrics: svc.metrics.export(args.metrics)
+        return 130
+    ex.shutdown()
+    if args.metrics: svc.metrics.export(args.metrics)
+    print(f"done: {ok} ok, {failed} failed", file=sys.stderr)
+    return 0 if not failed else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# Submit-to-render through streamlit's AppTest, upstreams replaced by the local stubs (no network, no keys).
+# Runs in a fresh interpreter so the fake Gemini SDK is installed before the page imports anything.
+# Times are what the page sees between reruns, so they include one rerun (~bench_page's rerun_s) of slack.
+#   python benchmarks/bench_e2e.py --gemini latency=1.5,chunks=20 --pplx latency=0.8 --repeat 3
+import argparse, json, os, statistics, subprocess, sys, tempfile, threading, time
+
+from common import ROOT
+
+SCENARIOS = ("stream_short", "blocking_short", "long_trip", "cached_repeat", "pdf")
+DEFAULT_PROFILES = {"gemini": "latency=0.5,chunks=10", "pplx": "latency=0.3", "rates": "latency=0.05"}
+_compile_lock = threading.Lock()
+
+# ---------- driving one page session
+def open_page(settings: dict):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    for k, v in settings.items(): at.secrets[k] = v
+    with _compile_lock:  # concurrent first compiles of the same script trip a CPython AST race
+        at.run()
+    return at
+
+def click(at, label: str):
+    next(b for b in at.button if label in str(b.label)).click()
+    at.run()
+
+def submit(at, destination: str, days: int, stream: bool = True):
+    at.sidebar.toggle(key="stream_mode").set_value(stream)
+    at.text_input[1].input(destination)
+    at.number_input[0].set_value(days)
+    t0 = time.perf_counter()
+    click(at, "Generate")
+    return t0
+
+def wait_rendered(at, t0: float, timeout_s: float = 120, poll_s: float = 0.02):
+    # -> (first_render_s, done_s, ok); first render = streamed tabs or the final plan on screen,
+    # done = plan and links both settled
+    first = None
+    while time.perf_counter() - t0 < timeout_s:
+        if first is None and (at.session_state["final_output"] or len(at.tabs)):
+            first = time.perf_counter() - t0
+        if not at.session_state["job_id"] and at.session_state["links_future"] is None:
+            done = time.perf_counter() - t0
+            ok = bool(at.session_state["final_output"]) and not at.exception
+            return first if first is not None else done, done, ok
+        time.sleep(poll_s)
+        at.run()
+    return first, None, False
+
+def wait_pdf(at, timeout_s: float = 60):
+    t0 = time.perf_counter()
+    click(at, "Prepare PDF")
+    while not at.get("download_button") and time.perf_counter() - t0 < timeout_s:
+        time.sleep(0.02)
+        at.run()
+    return time.perf_counter() - t0
+
+# ---------- scenarios
+def worker(profiles: dict, repeat: int):
+    from stubs import Profile, StubServer, install_fake_genai
+    genai = install_fake_genai(Profile.parse(profiles["gemini"]))
+    server = StubServer(Profile.parse(profiles["pplx"]), Profile.parse(profiles["rates"])).start()
+    settings = server.settings(tempfile.mkdtemp(prefix="nomadsquad-e2e-"))
+    samples = {s: {"first_render_s": [], "done_s": [], "failed": 0} for s in SCENARIOS}
+
+    def record(name, first, done, ok):
+        samples[name]["failed"] += not ok
+        if ok:
+            samples[name]["first_render_s"].append(first)
+            samples[name]["done_s"].append(done)
+
+    at = open_page(settings)
+    for i in range(repeat):
+        record("stream_short", *wait_rendered(at, submit(at, f"Stream City {i}", 3, stream=True)))
+        record("blocking_short", *wait_rendered(at, submit(at, f"Blocking City {i}", 3, stream=False)))
+        record("long_trip", *wait_rendered(at, submit(at, f"Long City {i}", 12, stream=False)))
+        record("cached_repeat", *wait_rendered(at, submit(at, f"Stream City {i}", 3, stream=True)))
+        pdf_s = wait_pdf(at)
+        record("pdf", pdf_s, pdf_s, bool(at.get("download_button")))
+    server.stop()
+    out = {"profiles": profiles, "repeat": repeat, "upstream_calls": dict(server.calls(), gemini={
+        "calls": genai.upstream.calls, "failures": genai.upstream.failures}), "scenarios": {}}
+    for name, s in samples.items():
+        out["scenarios"][name] = {k: statistics.median(s[k]) if s[k] else None for k in ("first_render_s", "done_s")}
+        out["scenarios"][name]["failed"] = s["failed"]
+    print(json.dumps(out))
+
+def run(profiles: dict = None, repeat: int = 3):
+    profiles = dict(DEFAULT_PROFILES, **(profiles or {}))
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", json.dumps(profiles), str(repeat)],
+                         capture_output=True, text=True, check=True, cwd=ROOT)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    for name, spec in DEFAULT_PROFILES.items():
+        ap.add_argument(f"--{name}", default=spec, help=f"stub profile (default {spec})")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--worker", nargs=2, metavar=("PROFILES", "REPEAT"))
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+    if args.worker:
+        worker(json.loads(args.worker[0]), int(args.worker[1]))
+        sys.exit(0)
+    res = run({n: getattr(args, n) for n in DEFAULT_PROFILES}, args.repeat)
+    if args.json:
+        print(json.dumps(res, indent=2))
+    else:
+        fmt = lambda v: f"{v*1000:7.0f} ms" if v is not None else "      –   "
+        for name, r in res["scenarios"].items():
+            print(f"{name:<15} first render {fmt(r['first_render_s'])} | done {fmt(r['done_s'])}"
+                  + (f"  [{r['failed']} failed]" if r["failed"] else ""))
+        print("upstream calls:", res["upstream_calls"])
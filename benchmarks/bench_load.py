@@ -0,0 +1,77 @@
+# Concurrent sessions against one process: N AppTest sessions share one Services (pools, admission
+# controller, caches) exactly like N browser tabs on one streamlit server, with the stubs upstream.
+# Each level runs in a fresh interpreter so no cache or breaker state carries over.
+#   python benchmarks/bench_load.py --sessions 1 4 16 --gemini latency=2,errors=0.05
+import argparse, json, os, statistics, subprocess, sys, tempfile, threading, time
+
+from common import ROOT
+from bench_e2e import DEFAULT_PROFILES
+
+def pct(values, q: float):
+    if not values: return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def worker(profiles: dict, sessions: int, days: int):
+    from stubs import Profile, StubServer, install_fake_genai
+    from bench_e2e import open_page, submit, wait_rendered
+    genai = install_fake_genai(Profile.parse(profiles["gemini"]))
+    server = StubServer(Profile.parse(profiles["pplx"]), Profile.parse(profiles["rates"])).start()
+    settings = server.settings(tempfile.mkdtemp(prefix="nomadsquad-load-"))
+    pages = [open_page(settings) for _ in range(sessions)]  # opened serially; the timed part is the submit
+    start = threading.Barrier(sessions)
+    results = [None] * sessions
+
+    def session(i):
+        start.wait()
+        t0 = submit(pages[i], f"Load City {i}", days)
+        results[i] = wait_rendered(pages[i], t0)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    t0 = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    wall = time.perf_counter() - t0
+    server.stop()
+    done = [r[1] for r in results if r[2]]
+    first = [r[0] for r in results if r[2]]
+    print(json.dumps({
+        "sessions": sessions, "days": days, "profiles": profiles, "ok": len(done), "failed": sessions - len(done),
+        "wall_s": wall, "plans_per_s": len(done) / wall if wall else 0.0,
+        "first_render_p50_s": pct(first, 0.5), "first_render_p95_s": pct(first, 0.95),
+        "done_p50_s": pct(done, 0.5), "done_p95_s": pct(done, 0.95), "done_max_s": max(done, default=None),
+        "done_mean_s": statistics.fmean(done) if done else None,
+        "upstream_calls": dict(server.calls(), gemini={"calls": genai.upstream.calls,
+                                                       "failures": genai.upstream.failures}),
+    }))
+
+def run(levels, profiles: dict = None, days: int = 3):
+    profiles = dict(DEFAULT_PROFILES, **(profiles or {}))
+    rows = []
+    for n in levels:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", json.dumps(profiles), str(n),
+                              str(days)], capture_output=True, text=True, check=True, cwd=ROOT)
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return rows
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    ap.add_argument("--days", type=int, default=3)
+    for name, spec in DEFAULT_PROFILES.items():
+        ap.add_argument(f"--{name}", default=spec, help=f"stub profile (default {spec})")
+    ap.add_argument("--worker", nargs=3, metavar=("PROFILES", "SESSIONS", "DAYS"))
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+    if args.worker:
+        worker(json.loads(args.worker[0]), int(args.worker[1]), int(args.worker[2]))
+        sys.exit(0)
+    rows = run(args.sessions, {n: getattr(args, n) for n in DEFAULT_PROFILES}, args.days)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        ms = lambda v: f"{v*1000:7.0f}" if v is not None else "      –"
+        for r in rows:
+            print(f"{r['sessions']:>3} sessions | {r['ok']} ok {r['failed']} failed | {r['plans_per_s']:5.2f} plans/s | "
+                  f"first render p50 {ms(r['first_render_p50_s'])} ms | done p50 {ms(r['done_p50_s'])} ms "
+                  f"p95 {ms(r['done_p95_s'])} ms")
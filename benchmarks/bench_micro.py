@@ -0,0 +1,44 @@
+# Hot functions on their own: line breaking, markdown -> plain text, and the whole PDF build.
+#   python benchmarks/bench_micro.py --days 5 15 30
+import argparse, json
+
+from common import measure, sample_itinerary
+import pdf_export
+from itinerary_doc import parse_itinerary
+from pdf_export import PDF_BODY, PDF_MARGIN, PDF_PAGE, build_pdf_bytes, markdown_to_plain, pdf_font, wrap_text_to_width
+from pdf_writer import TEXT_MEASURE
+
+def run(days_list, repeat: int = 10):
+    font, width = pdf_font().at(PDF_BODY[0]), PDF_PAGE[0] - 2 * PDF_MARGIN
+    build_pdf_bytes(sample_itinerary(1))  # font load is a one-off per process, like the app
+    rows = []
+    for days in days_list:
+        raw = sample_itinerary(days)
+        text = markdown_to_plain(raw)
+        uncached_plain = lambda: (parse_itinerary.cache_clear(), markdown_to_plain(raw))
+        cold_wrap = lambda: (pdf_export._WORD_WIDTHS.clear(), wrap_text_to_width(TEXT_MEASURE, text, font, width))
+        cold_pdf = lambda: (parse_itinerary.cache_clear(), pdf_export.block_pdf_lines.cache_clear(),
+                            build_pdf_bytes(raw, title="NomadSquad — Benchmark"))
+        rows.append({
+            "days": days, "chars": len(raw),
+            "markdown_to_plain_s": measure(uncached_plain, repeat)["best"],
+            "wrap_text_to_width_cold_s": measure(cold_wrap, repeat)["best"],
+            "wrap_text_to_width_s": measure(lambda: wrap_text_to_width(TEXT_MEASURE, text, font, width), repeat)["best"],
+            "build_pdf_bytes_s": measure(cold_pdf, max(3, repeat // 3))["best"],
+        })
+    return rows
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, nargs="+", default=[5, 15, 30])
+    ap.add_argument("--repeat", type=int, default=10)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+    rows = run(args.days, args.repeat)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for r in rows:
+            print(f"{r['days']:>3} days {r['chars']:>7} chars | markdown_to_plain {r['markdown_to_plain_s']*1000:7.2f} ms | "
+                  f"wrap cold {r['wrap_text_to_width_cold_s']*1000:7.2f} ms warm {r['wrap_text_to_width_s']*1000:7.2f} ms | "
+                  f"build_pdf_bytes {r['build_pdf_bytes_s']*1000:7.1f} ms")
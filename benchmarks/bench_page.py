@@ -0,0 +1,82 @@
+# Page cold start and rerun latency through streamlit's AppTest, each variant in a fresh interpreter.
+# AppTest always re-executes the whole script, so "rerun" is the full-page cost; the time spent inside
+# each @st.fragment body is recorded too, which is what an interaction in that block costs on a server.
+#   python benchmarks/bench_page.py --app app.py /tmp/old/app.py
+import argparse, collections, functools, json, os, statistics, subprocess, sys, tempfile, time
+
+from common import ROOT, sample_itinerary
+
+def time_fragments(st, times):
+    original = st.fragment
+
+    def fragment(func=None, **kwargs):
+        def wrap(f):
+            @functools.wraps(f)
+            def timed(*args, **kw):
+                t = time.perf_counter()
+                try: return f(*args, **kw)
+                finally: times[f.__name__].append(time.perf_counter() - t)
+            return original(timed, **kwargs)
+        return wrap(func) if func else wrap
+    st.fragment = fragment
+
+def worker(app_path: str, reruns: int):
+    t0 = time.perf_counter()
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    times = collections.defaultdict(list)
+    time_fragments(st, times)
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.secrets["GEMINI_API_KEY"] = "benchmark"
+    at.secrets["CACHE_DIR"] = tempfile.mkdtemp(prefix="nomadsquad-bench-")
+    at.run()
+    cold = time.perf_counter() - t0
+    genai_loaded = "google.generativeai" in sys.modules
+
+    def timed_reruns(touch):
+        samples = []
+        for i in range(reruns):
+            touch(i)
+            t = time.perf_counter()
+            at.run()
+            samples.append(time.perf_counter() - t)
+        return statistics.median(samples)
+
+    budget = lambda i: at.slider[0].set_value(1000 + 100 * (i % 5))
+    empty = timed_reruns(budget)
+    at.session_state["final_output"] = sample_itinerary(10)
+    times.clear()
+    with_plan = timed_reruns(budget)
+    blocks = {name: statistics.median(v) for name, v in times.items()}
+    print(json.dumps({"app": app_path, "cold_start_s": cold, "genai_imported": genai_loaded,
+                      "rerun_s": empty, "rerun_with_plan_s": with_plan, "fragment_s": blocks,
+                      "exception": bool(at.exception)}))
+
+def run(apps, reruns):
+    rows = []
+    for app in apps:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", os.path.abspath(app), str(reruns)],
+                             capture_output=True, text=True, check=True, cwd=ROOT)
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return rows
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--app", nargs="+", default=[os.path.join(ROOT, "app.py")])
+    ap.add_argument("--reruns", type=int, default=15)
+    ap.add_argument("--worker", nargs=2, metavar=("APP", "RERUNS"))
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+    if args.worker:
+        worker(args.worker[0], int(args.worker[1]))
+        sys.exit(0)
+    rows = run(args.app, args.reruns)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for r in rows:
+            print(f"{r['app']}\n  cold start {r['cold_start_s']*1000:7.0f} ms (genai imported: {r['genai_imported']})"
+                  f" | rerun {r['rerun_s']*1000:6.1f} ms | rerun with plan {r['rerun_with_plan_s']*1000:6.1f} ms"
+                  + ("  [page raised]" if r["exception"] else ""))
+            for name, secs in sorted(r["fragment_s"].items()):
+                print(f"    fragment {name:<16} {secs*1000:6.1f} ms")
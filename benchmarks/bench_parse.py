@@ -0,0 +1,60 @@
+# Per-rerun cost of turning final_output into tab sections + PDF plain text.
+#   python benchmarks/bench_parse.py --days 5 15 30
+import argparse, json
+
+from common import measure, sample_itinerary
+import legacy
+from itinerary_doc import parse_itinerary
+
+def rerun_legacy(raw):
+    legacy.split_sections(raw)
+    legacy.markdown_to_plain(raw)
+
+def rerun_doc(raw):
+    doc = parse_itinerary(raw)
+    for key in ("overview", "itinerary", "tips"): doc.section_markdown(key)
+    doc.blocks()
+
+def cold_doc(raw):
+    parse_itinerary.cache_clear()
+    rerun_doc(raw)
+
+def parity_cases(days):
+    raw = sample_itinerary(days)
+    # a "Day N" mention in the overview must not start the itinerary ahead of its heading
+    yield raw
+    yield raw.replace("**Packing list:**", "**Day 1 tip:** arrive early.\n**Packing list:**", 1)
+
+def check_parity(raw):
+    # the tabs must show exactly what the old split on the headings produced
+    doc = parse_itinerary(raw)
+    for key, old in zip(("overview", "itinerary", "tips"), legacy.split_sections(raw)):
+        if doc.section_markdown(key) != old: raise AssertionError(f"{key} differs from the legacy split")
+
+def run(days_list, repeat):
+    rows = []
+    for days in days_list:
+        for case in parity_cases(days): check_parity(case)
+        raw = sample_itinerary(days)
+        rerun_doc(raw)  # warm the memo the way the second rerun sees it
+        rows.append({
+            "days": days, "chars": len(raw),
+            "legacy_per_rerun_s": measure(lambda: rerun_legacy(raw), repeat)["best"],
+            "doc_first_parse_s": measure(lambda: cold_doc(raw), repeat)["best"],
+            "doc_per_rerun_s": measure(lambda: rerun_doc(raw), repeat)["best"],
+        })
+    return rows
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, nargs="+", default=[5, 15, 30])
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+    rows = run(args.days, args.repeat)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for r in rows:
+            print(f"{r['days']:>3} days {r['chars']:>7} chars | legacy {r['legacy_per_rerun_s']*1e6:8.1f} µs/rerun | "
+                  f"doc first parse {r['doc_first_parse_s']*1e6:8.1f} µs | doc rerun {r['doc_per_rerun_s']*1e6:6.1f} µs")
@@ -0,0 +1,49 @@
+# Raster (original Pillow page images) vs vector PDF export: time, peak RSS, file size.
+# Each measurement runs in a fresh interpreter so peak RSS isn't shared between runs.
+#   python benchmarks/bench_pdf.py --days 5 15 30
+import argparse, json, os, resource, subprocess, sys, time
+
+from common import sample_itinerary
+
+def worker(variant: str, days: int):
+    raw = sample_itinerary(days)
+    if variant == "raster":
+        import legacy
+        build = legacy.build_pdf_bytes
+    else:
+        from pdf_export import build_pdf_bytes as build
+        build(sample_itinerary(1))  # font load is a one-off per process, like the app
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    size = len(build(raw, title="NomadSquad — Benchmark").getvalue())
+    elapsed = time.perf_counter() - t0
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"variant": variant, "days": days, "seconds": elapsed, "bytes": size,
+                      "peak_rss_mb": rss_peak / 1024, "rss_growth_mb": (rss_peak - rss_before) / 1024}))
+
+def run(days_list, variants):
+    rows = []
+    for days in days_list:
+        for variant in variants:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", variant, str(days)],
+                                 capture_output=True, text=True, check=True)
+            rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return rows
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, nargs="+", default=[5, 15, 30])
+    ap.add_argument("--variants", nargs="+", default=["raster", "vector"])
+    ap.add_argument("--worker", nargs=2, metavar=("VARIANT", "DAYS"))
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+    if args.worker:
+        worker(args.worker[0], int(args.worker[1]))
+        sys.exit(0)
+    rows = run(args.days, args.variants)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for r in rows:
+            print(f"{r['days']:>3} days {r['variant']:>6} | {r['seconds']*1000:8.1f} ms | {r['bytes']/1024:9.1f} KiB | "
+                  f"peak RSS {r['peak_rss_mb']:6.1f} MiB (+{r['rss_growth_mb']:.1f})")
@@ -0,0 +1,52 @@
+# Line breaking throughput, original wrap_text_to_width vs the cached-width engine.
+# Also checks that both produce the same lines (inputs without over-long tokens).
+#   python benchmarks/bench_wrap.py --days 5 15 30
+import argparse, json
+
+from common import measure, sample_itinerary
+import legacy
+import pdf_export
+from pdf_export import PDF_BODY, PDF_MARGIN, PDF_PAGE, markdown_to_plain, pdf_font, wrap_text_to_width
+from pdf_writer import TEXT_MEASURE
+
+def fonts():
+    # (name, draw, font, max_width): the Pillow setup the raster export used, and the PDF font
+    out = []
+    try:
+        from PIL import Image, ImageDraw, ImageFont
+        out.append(("pillow-default", ImageDraw.Draw(Image.new("RGB", (1, 1))), ImageFont.load_default(), 1240 - 160))
+    except ImportError:
+        pass
+    out.append(("pdf-" + pdf_font().name, TEXT_MEASURE, pdf_font().at(PDF_BODY[0]), PDF_PAGE[0] - 2 * PDF_MARGIN))
+    return out
+
+def run(days_list, repeat):
+    rows = []
+    for days in days_list:
+        text = markdown_to_plain(sample_itinerary(days))
+        for name, draw, font, width in fonts():
+            before = legacy.wrap_text_to_width(draw, text, font, width)
+            after = wrap_text_to_width(draw, text, font, width)
+            cold = lambda: (pdf_export._WORD_WIDTHS.clear(), wrap_text_to_width(draw, text, font, width))
+            t_legacy = measure(lambda: legacy.wrap_text_to_width(draw, text, font, width), repeat)["best"]
+            t_cold = measure(cold, repeat)["best"]
+            t_warm = measure(lambda: wrap_text_to_width(draw, text, font, width), repeat)["best"]
+            rows.append({"days": days, "font": name, "lines": len(before), "identical": before == after,
+                         "legacy_lines_per_s": len(before) / t_legacy, "cold_lines_per_s": len(after) / t_cold,
+                         "warm_lines_per_s": len(after) / t_warm})
+    return rows
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, nargs="+", default=[5, 15, 30])
+    ap.add_argument("--repeat", type=int, default=10)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+    rows = run(args.days, args.repeat)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        for r in rows:
+            print(f"{r['days']:>3} days {r['font']:>15} {r['lines']:>5} lines same={r['identical']} | "
+                  f"legacy {r['legacy_lines_per_s']:>9,.0f}/s | cold cache {r['cold_lines_per_s']:>9,.0f}/s | "
+                  f"warm {r['warm_lines_per_s']:>10,.0f}/s")
@@ -0,0 +1,31 @@
+import os, random, statistics, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+WORDS = ("sunrise hike temple market street food rooftop sunset ferry museum old town café gelato local "
+         "tuk-tuk boat tour hidden gem lagoon night bazaar spice dumplings viewpoint cable car beach").split()
+
+def sample_itinerary(days: int, seed: int = 7) -> str:
+    # shaped like a real Gemini answer: three headings, bold day lines, bullets, long-ish sentences
+    rnd = random.Random(seed)
+    sentence = lambda n: " ".join(rnd.choice(WORDS) for _ in range(n)).capitalize() + "."
+    out = ["### 🎉 Your NomadSquad Trip Overview & Seasonal Intel! 🎉",
+           f"**Weather:** {sentence(25)}", "**Packing list:**", *[f"- {sentence(8)}" for _ in range(8)], "",
+           f"### 🗺️ Your Awesome {days}-Day Adventure Itinerary! 🗺️", sentence(20), ""]
+    for d in range(1, days + 1):
+        out += [f"**Day {d}: {sentence(4)}**",
+                *[f"- **{slot}:** {sentence(rnd.randint(20, 45))} https://example.com/{d}/{slot.lower()}"
+                  for slot in ("Morning", "Afternoon", "Evening")], ""]
+    out += ["### ✨ NomadSquad's Pro Tips & Essential Info! ✨", *[f"- {sentence(18)}" for _ in range(12)],
+            "**Local Lingo:**", *[f"- *{rnd.choice(WORDS)}* = {sentence(6)}" for _ in range(8)]]
+    return "\n".join(out)
+
+def measure(fn, repeat: int = 20):
+    # -> dict of seconds; best is the least noisy number for small functions
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {"best": min(samples), "mean": statistics.fmean(samples), "repeat": repeat}
@@ -0,0 +1,78 @@
+# Frozen copies of the original app.py helpers, kept as the "before" side of the benchmarks.
+import io
+
+def split_sections(raw):
+    overview, itinerary, tips = "", "", ""
+    if "### 🎉 Your NomadSquad Trip Overview" in raw and "### 🗺️" in raw:
+        overview = raw.split("### 🗺️",1)[0].split("### 🎉",1)[-1]
+        rest = "### 🗺️" + raw.split("### 🗺️",1)[1]
+        if "### ✨" in rest:
+            itinerary = rest.split("### ✨",1)[0]
+            tips = "### ✨" + rest.split("### ✨",1)[1]
+        else:
+            itinerary = rest
+    return overview, itinerary, tips
+
+def wrap_text_to_width(draw, text, font, max_width):
+    lines = []
+    for paragraph in text.split("\n"):
+        if not paragraph:
+            lines.append("")
+            continue
+        words = paragraph.split(" ")
+        line = ""
+        for w in words:
+            test = (line + " " + w).strip()
+            if draw.textlength(test, font=font) <= max_width:
+                line = test
+            else:
+                if line: lines.append(line)
+                line = w
+        if line: lines.append(line)
+    return lines
+
+def markdown_to_plain(md):
+    lines = []
+    for raw in md.splitlines():
+        s = raw.replace("**","").replace("__","")
+        s = s.replace("###","").replace("##","").replace("#","").lstrip()
+        lines.append(s)
+    return "\n".join(lines)
+
+def build_pdf_bytes(markdown_text, title="NomadSquad Itinerary"):
+    from PIL import Image, ImageDraw, ImageFont
+    W, H = 1240, 1754
+    M = 80
+    font_title = ImageFont.load_default()
+    font_body = ImageFont.load_default()
+
+    pages = []
+    text = f"{title}\n\n" + markdown_to_plain(markdown_text)
+
+    temp = Image.new("RGB", (W, H), "white")
+    draw_temp = ImageDraw.Draw(temp)
+
+    y = M
+    page = Image.new("RGB", (W, H), "white")
+    draw = ImageDraw.Draw(page)
+
+    for t in wrap_text_to_width(draw, title, font_title, W - 2*M):
+        draw.text((M, y), t, font=font_title, fill="black")
+        y += 28
+    y += 10
+
+    for line in wrap_text_to_width(draw_temp, text, font_body, W - 2*M):
+        if y > H - M:
+            pages.append(page)
+            page = Image.new("RGB", (W, H), "white")
+            draw = ImageDraw.Draw(page)
+            y = M
+        draw.text((M, y), line, font=font_body, fill="black")
+        y += 22
+
+    pages.append(page)
+
+    bio = io.BytesIO()
+    pages[0].save(bio, format="PDF", save_all=True, append_images=pages[1:])
+    bio.seek(0)
+    return bio
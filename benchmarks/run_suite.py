@@ -0,0 +1,110 @@
+# The whole offline suite in one go -> one JSON file of flat, named numbers; with --baseline it also
+# compares against an earlier file and exits 1 when anything got slower than the tolerance allows.
+#   python benchmarks/run_suite.py -o benchmarks/results/base.json
+#   python benchmarks/run_suite.py --baseline benchmarks/results/base.json --tolerance 0.2
+import argparse, datetime, json, os, platform, subprocess, sys, time
+
+from common import ROOT
+import bench_e2e, bench_load, bench_micro, bench_page
+
+SECTIONS = ("micro", "page", "e2e", "load")
+
+def collect(sections, quick: bool = False, profiles: dict = None) -> dict:
+    # -> {"section.case.metric": number}; names ending _per_s are higher-is-better, everything else lower
+    out = {}
+    if "micro" in sections:
+        for r in bench_micro.run([5, 30] if quick else [5, 15, 30], 5 if quick else 20):
+            out.update({f"micro.{r['days']}d.{k}": v for k, v in r.items() if k.endswith("_s")})
+    if "page" in sections:
+        r = bench_page.run([os.path.join(ROOT, "app.py")], 5 if quick else 15)[0]
+        out.update({f"page.{k}": r[k] for k in ("cold_start_s", "rerun_s", "rerun_with_plan_s")})
+    if "e2e" in sections:
+        r = bench_e2e.run(profiles, 1 if quick else 3)
+        for name, s in r["scenarios"].items():
+            out.update({f"e2e.{name}.{k}": v for k, v in s.items() if v is not None})
+    if "load" in sections:
+        for r in bench_load.run([1, 4] if quick else [1, 4, 16], profiles):
+            out.update({f"load.{r['sessions']}x.{k}": r[k] for k in (
+                "first_render_p50_s", "done_p50_s", "done_p95_s", "plans_per_s", "failed") if r[k] is not None})
+    return out
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=ROOT, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(current: dict, baseline: dict, tolerance: float, min_abs_s: float, min_abs_micro_s: float):
+    # -> rows of (name, base, now, relative change, verdict); tiny absolute moves never count as regressions
+    # (page/e2e/load timings move by a rerun or a poll, micro ones by timer noise)
+    rows = []
+    for name in sorted(set(current) | set(baseline)):
+        base, now = baseline.get(name), current.get(name)
+        if base is None or now is None:
+            rows.append((name, base, now, None, "new" if base is None else "missing"))
+            continue
+        higher_better = name.endswith("_per_s")
+        change = (now - base) / base if base else (0.0 if now == base else float("inf"))
+        worse = -change if higher_better else change
+        floor = 0 if higher_better or not name.endswith("_s") else \
+            min_abs_micro_s if name.startswith("micro.") else min_abs_s
+        if worse > tolerance and abs(now - base) > floor:
+            verdict = "REGRESSION"
+        elif -worse > tolerance and abs(now - base) > floor:
+            verdict = "improved"
+        else:
+            verdict = "ok"
+        rows.append((name, base, now, change, verdict))
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline NomadSquad benchmarks (stubbed upstreams).")
+    ap.add_argument("-o", "--output", help="results JSON (default benchmarks/results/<utc time>.json)")
+    ap.add_argument("--only", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    ap.add_argument("--quick", action="store_true", help="fewer sizes, repeats and load levels")
+    ap.add_argument("--baseline", help="earlier results JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="relative slowdown that counts as a regression")
+    ap.add_argument("--min-abs", type=float, default=0.05, help="ignore page/e2e/load changes smaller than this (s)")
+    ap.add_argument("--min-abs-micro", type=float, default=0.0002, help="the same for micro-benchmarks (s)")
+    for name, spec in bench_e2e.DEFAULT_PROFILES.items():
+        ap.add_argument(f"--{name}", default=spec, help=f"stub profile for e2e/load (default {spec})")
+    args = ap.parse_args(argv)
+
+    profiles = {n: getattr(args, n) for n in bench_e2e.DEFAULT_PROFILES}
+    t0 = time.perf_counter()
+    results = collect(args.only, args.quick, profiles)
+    doc = {
+        "meta": {"time": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+                 "commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "quick": args.quick, "sections": args.only, "profiles": profiles,
+                 "elapsed_s": round(time.perf_counter() - t0, 1)},
+        "results": results,
+    }
+    path = args.output or os.path.join(ROOT, "benchmarks", "results",
+                                       datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+    print(f"{len(results)} results -> {path}", file=sys.stderr)
+
+    if not args.baseline:
+        for name, v in sorted(results.items()): print(f"{name:<45} {v:12.4f}")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+    if base["meta"].get("profiles") != profiles or base["meta"].get("quick") != args.quick:
+        print("⚠️ baseline used different stub profiles or --quick; e2e/load numbers aren't comparable",
+              file=sys.stderr)
+    ran = {k: v for k, v in base["results"].items() if k.split(".", 1)[0] in args.only}
+    rows = compare(results, ran, args.tolerance, args.min_abs, args.min_abs_micro)
+    shown = lambda v: f"{v:12.4f}" if v is not None else f"{'–':>12}"
+    for name, b, n, change, verdict in rows:
+        pct = f"{change:+7.1%}" if change is not None else " " * 7
+        print(f"{name:<45} {shown(b)} -> {shown(n)} {pct}  {verdict}")
+    regressions = [r for r in rows if r[4] == "REGRESSION"]
+    print(f"{len(regressions)} regression(s) against {args.baseline} (tolerance {args.tolerance:.0%})", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
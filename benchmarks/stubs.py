@@ -0,0 +1,229 @@
+# Local stand-ins for the three upstreams, so every benchmark runs offline and repeats exactly:
+# a fake google.generativeai module, and one HTTP server that answers the Perplexity chat-completions
+# and ExchangeRate-API (/latest and /pair) shapes. Latency, error rate and response size are per upstream.
+#   python benchmarks/stubs.py --pplx latency=0.8,errors=0.1 --rates latency=0.05   (serves until Ctrl-C)
+import argparse, hashlib, json, random, re, sys, threading, time, types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import WORDS, sample_itinerary
+
+class Profile:
+    __slots__ = ("latency_s", "jitter_s", "errors", "size", "chunks", "seed")
+
+    def __init__(self, latency_s=0.0, jitter_s=0.0, errors=0.0, size=1.0, chunks=12, seed=7):
+        # size scales the response body (extra tips for Gemini, results for Perplexity, currencies for rates);
+        # chunks is how many pieces a streamed Gemini answer arrives in, latency_s spread across them
+        self.latency_s, self.jitter_s, self.errors, self.size = float(latency_s), float(jitter_s), float(errors), float(size)
+        self.chunks, self.seed = int(chunks), int(seed)
+
+    @classmethod
+    def parse(cls, spec: str):
+        # "latency=0.3,jitter=0.1,errors=0.05,size=2"
+        names = {"latency": "latency_s", "jitter": "jitter_s"}
+        kw = {}
+        for part in filter(None, (spec or "").split(",")):
+            k, _, v = part.partition("=")
+            kw[names.get(k.strip(), k.strip())] = v
+        return cls(**kw)
+
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+class Upstream:
+    # one profile plus its own seeded RNG, so a run's delays and failures are the same every time
+    def __init__(self, profile: Profile):
+        self.profile = profile
+        self._rnd = random.Random(profile.seed)
+        self._lock = threading.Lock()
+        self.calls = self.failures = 0
+
+    def delay(self) -> float:
+        with self._lock:
+            return max(0.0, self.profile.latency_s + self._rnd.uniform(-1, 1) * self.profile.jitter_s)
+
+    def fails(self) -> bool:
+        with self._lock:
+            self.calls += 1
+            failed = self._rnd.random() < self.profile.errors
+            self.failures += failed
+            return failed
+
+# ======================
+# Gemini: a module object that stands in for google.generativeai
+# ======================
+class FakeUsage:
+    def __init__(self, prompt: str, text: str):
+        self.prompt_token_count, self.candidates_token_count = len(prompt) // 4, len(text) // 4
+
+class FakeResponse:
+    def __init__(self, text: str, usage=None):
+        self.text, self.usage_metadata = text, usage
+
+def gemini_answer(prompt: str, size: float) -> str:
+    # follows the prompt shapes in planner / long_trip / itinerary_edit closely enough for every path
+    m = re.search(r"Duration: (\d+)", prompt)
+    days = int(m.group(1)) if m else 3
+    if "Reply with exactly these headings" in prompt:
+        return ("### 🎉 Your NomadSquad Trip Overview & Seasonal Intel! 🎉\nSunny, pack light.\n### 🧭 Day Themes\n"
+                + "\n".join(f"Day {d}: {WORDS[d % len(WORDS)]} — old town" for d in range(1, days + 1))
+                + "\n### ✨ NomadSquad's Pro Tips & Essential Info! ✨\n- Carry cash.")
+    m = re.search(r"Write ONLY Day (\d+) to Day (\d+)", prompt)
+    if m:
+        block = sample_itinerary(int(m.group(2))).split("**Day ")
+        return "\n".join("**Day " + b for b in block[int(m.group(1)):int(m.group(2)) + 1]).split("### ✨")[0].strip()
+    m = re.search(r"--- PART TO REWRITE: (.+?) ---\n(.*?)\n--- CHANGE REQUESTED", prompt, re.S)
+    if m:
+        return m.group(2).strip() + "\n- Rewritten by the stub."
+    text = sample_itinerary(days)
+    extra = int(len(text) * (size - 1) / 80) if size > 1 else 0
+    return text + "".join(f"\n- Extra tip {i}: {' '.join(WORDS[(i + j) % len(WORDS)] for j in range(12))}."
+                          for i in range(extra))
+
+class FakeModel:
+    def __init__(self, upstream: Upstream, name: str):
+        self.upstream, self.name = upstream, name
+
+    def generate_content(self, prompt, generation_config=None, safety_settings=None, stream=False, **kwargs):
+        delay, failed = self.upstream.delay(), self.upstream.fails()
+        if failed:
+            time.sleep(delay / 2)
+            raise RuntimeError("503 stub: model overloaded")
+        text = gemini_answer(prompt, self.upstream.profile.size)
+        if not stream:
+            time.sleep(delay)
+            return FakeResponse(text, FakeUsage(prompt, text))
+        return self._stream(prompt, text, delay)
+
+    def _stream(self, prompt, text, delay):
+        n = max(1, self.upstream.profile.chunks)
+        step = -(-len(text) // n)
+        for i in range(0, len(text), step):
+            time.sleep(delay / n)
+            last = i + step >= len(text)
+            yield FakeResponse(text[i:i + step], FakeUsage(prompt, text) if last else None)
+
+def fake_genai(profile: Profile, models=("models/gemini-3-flash-preview",)):
+    upstream = Upstream(profile)
+    mod = types.ModuleType("google.generativeai")
+    mod.upstream = upstream
+    mod.configure = lambda **kwargs: None
+    mod.GenerativeModel = lambda name, **kwargs: FakeModel(upstream, name)
+    mod.list_models = lambda: [types.SimpleNamespace(name=m, supported_generation_methods=["generateContent"])
+                               for m in models]
+    return mod
+
+def install_fake_genai(profile: Profile):
+    # must run before anything imports google.generativeai (Services.router imports it lazily)
+    mod = fake_genai(profile)
+    google = sys.modules.get("google") or types.ModuleType("google")
+    if not hasattr(google, "__path__"): google.__path__ = []
+    google.generativeai = mod
+    sys.modules["google"], sys.modules["google.generativeai"] = google, mod
+    return mod
+
+# ======================
+# Perplexity + ExchangeRate-API over local HTTP
+# ======================
+CURRENCIES = ("USD", "EUR", "GBP", "INR", "JPY", "AUD", "CAD", "SGD", "AED", "THB", "CHF", "CNY", "NZD", "ZAR")
+
+def rates_table(size: float) -> dict:
+    rnd = random.Random(1)
+    codes = list(CURRENCIES) + [f"X{i:02d}" for i in range(max(0, int(len(CURRENCIES) * (size - 1))))]
+    return {c: 1.0 if c == "USD" else round(rnd.uniform(0.2, 150), 4) for c in codes}
+
+def pplx_answer(body: dict, size: float) -> dict:
+    query = body["messages"][-1]["content"]
+    n = max(1, int(8 * size))
+    slug = hashlib.sha1(query.encode("utf-8")).hexdigest()[:10]  # distinct links per query, stable across runs
+    return {
+        "choices": [{"message": {"role": "assistant", "content": "\n".join(f"- Option {i}" for i in range(n))}}],
+        "search_results": [{"title": f"Stub stay {i}", "url": f"https://stays.example/{slug}/{i}", "date": "2026-01-01"}
+                           for i in range(n)],
+    }
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs, so pooled sessions get reused
+
+    def log_message(self, *args): pass
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _serve(self, upstream: Upstream, answer):
+        delay, failed = upstream.delay(), upstream.fails()
+        time.sleep(delay)
+        if failed: return self._send(503, {"error": "stub: upstream unavailable"})
+        self._send(200, answer())
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            up = self.server.upstreams["pplx"]
+            return self._serve(up, lambda: pplx_answer(body, up.profile.size))
+        self._send(404, {"error": "not found"})
+
+    def do_GET(self):
+        up = self.server.upstreams["rates"]
+        m = re.match(r"/v6/[^/]+/latest/([A-Z]{3})$", self.path)
+        if m:
+            def latest():
+                table = rates_table(up.profile.size)
+                base = table.get(m.group(1), 1.0)
+                return {"result": "success", "base_code": m.group(1),
+                        "conversion_rates": {c: round(v / base, 6) for c, v in table.items()}}
+            return self._serve(up, latest)
+        m = re.match(r"/v6/[^/]+/pair/([A-Z]{3})/([A-Z]{3})$", self.path)
+        if m:
+            def pair():
+                table = rates_table(up.profile.size)
+                return {"result": "success", "base_code": m.group(1), "target_code": m.group(2),
+                        "conversion_rate": table.get(m.group(2), 1.0) / table.get(m.group(1), 1.0)}
+            return self._serve(up, pair)
+        self._send(404, {"result": "error", "error-type": "unsupported-code"})
+
+class StubServer:
+    def __init__(self, pplx: Profile = None, rates: Profile = None, port: int = 0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.upstreams = {"pplx": Upstream(pplx or Profile()), "rates": Upstream(rates or Profile())}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="stub-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def calls(self) -> dict:
+        return {name: {"calls": u.calls, "failures": u.failures} for name, u in self.httpd.upstreams.items()}
+
+    def settings(self, cache_dir: str, **extra) -> dict:
+        # what secrets.toml would hold, pointed at this server
+        out = {"GEMINI_API_KEY": "stub", "PPLX_API_KEY": "stub", "EXCHANGE_RATE_API_KEY": "stub", "CACHE_DIR": cache_dir,
+               "PPLX_URL": f"{self.url}/chat/completions", "EXCHANGE_RATE_URL": self.url + "/v6/{key}/latest/{base}"}
+        out.update(extra)
+        return out
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--pplx", default="", help="profile, e.g. latency=0.8,jitter=0.2,errors=0.05,size=1")
+    ap.add_argument("--rates", default="")
+    args = ap.parse_args()
+    server = StubServer(Profile.parse(args.pplx), Profile.parse(args.rates), args.port).start()
+    print(f"stubs on {server.url}: PPLX_URL={server.url}/chat/completions "
+          f"EXCHANGE_RATE_URL={server.url}/v6/{{key}}/latest/{{base}}")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,167 @@
+import threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# ======================
+# Warm Gemini models shared by every session, routed by observed latency/errors,
+# with an optional hedged second request for slow answers
+# ======================
+LATENCY_WINDOW = 50     # recent calls per model used for p50/p95
+FAIL_STREAK = 3         # consecutive failures before a model sits out
+COOLDOWN_S = 60.0
+MODEL_LIST_TTL_S = 3600
+
+def model_names(value) -> list:
+    # GEMINI_MODELS may be a TOML list or one string, "a" or "a, b"
+    if isinstance(value, str): value = value.split(",")
+    return list(dict.fromkeys(v.strip() for v in value if v and v.strip()))
+
+class ModelStats:
+    __slots__ = ("latencies", "calls", "errors", "streak", "benched_at", "hedges", "hedge_wins")
+
+    def __init__(self):
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.calls = self.errors = self.streak = self.hedges = self.hedge_wins = 0
+        self.benched_at = None
+
+    def pct(self, q: float):
+        if not self.latencies: return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def healthy(self, now: float) -> bool:
+        return self.benched_at is None or now - self.benched_at >= COOLDOWN_S
+
+def _blame(e: Exception, name: str):
+    # remember which model failed, so error logs name the one the router actually picked
+    try: e.gemini_model = name
+    except AttributeError: pass
+
+class GeminiRouter:
+    def __init__(self, genai, api_key: str, models, hedge: bool = False, hedge_min_s: float = 8.0,
+                 generation_config=None, safety_settings=None, hedge_budget=None):
+        self.genai, self.names = genai, model_names(models)
+        # a hedge re-sends the prompt to a second model, so it needs one, plus a spare rate-limit token
+        self.hedge, self.hedge_min_s = hedge and len(self.names) > 1, hedge_min_s
+        self.hedge_budget = hedge_budget or (lambda: True)
+        self.generation_config, self.safety_settings = generation_config, safety_settings
+        genai.configure(api_key=api_key)  # once per process, not per request
+        self._models = {name: genai.GenerativeModel(name) for name in self.names}
+        self._stats = {name: ModelStats() for name in self.names}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="nomadsquad-gemini")
+        self._available, self._listed_at = None, 0.0
+        self._pool.submit(self.available_models)  # warm the model list off the request path
+
+    # ---------- routing
+    def ranked(self):
+        # healthy first, then not just-failed, then fastest p50; an untried model counts as fast so it gets measured
+        now = time.monotonic()
+        with self._lock:
+            def score(i_name):
+                i, name = i_name
+                s = self._stats[name]
+                return (not s.healthy(now), s.streak > 0, s.pct(0.5) or 0.0, i)
+            return [name for _, name in sorted(enumerate(self.names), key=score)]
+
+    def _record(self, name: str, ok: bool, latency: float = None):
+        with self._lock:
+            s = self._stats[name]
+            s.calls += 1
+            if ok:
+                s.streak, s.benched_at = 0, None
+                if latency is not None: s.latencies.append(latency)
+            else:
+                s.errors += 1
+                s.streak += 1
+                if s.streak >= FAIL_STREAK: s.benched_at = time.monotonic()
+
+    def _call(self, name: str, prompt: str, timeout: float = None):
+        t0 = time.perf_counter()
+        extra = {"request_options": {"timeout": timeout}} if timeout is not None else {}
+        try:
+            resp = self._models[name].generate_content(
+                prompt, generation_config=self.generation_config, safety_settings=self.safety_settings, **extra
+            )
+        except Exception as e:
+            self._record(name, False)
+            _blame(e, name)
+            raise
+        self._record(name, True, time.perf_counter() - t0)
+        return resp
+
+    # ---------- calls
+    def generate(self, prompt: str, timeout: float = None):
+        # -> (response, model name); hedges to the runner-up model after the primary's p95.
+        # timeout (s) bounds each model call, hedges included
+        order = self.ranked()
+        primary = order[0]
+        if not self.hedge:
+            return self._call(primary, prompt, timeout), primary
+        with self._lock:
+            p95 = self._stats[primary].pct(0.95)
+        delay = max(self.hedge_min_s, p95 or 0.0)
+        first = self._pool.submit(self._call, primary, prompt, timeout)
+        futs = {first: primary}
+        done, _ = wait(futs, timeout=delay)
+        if (not done or first.exception() is not None) and self.hedge_budget():
+            # slow past its p95, or already failed: send the same prompt to the runner-up
+            backup = order[1]
+            futs[self._pool.submit(self._call, backup, prompt, None if timeout is None else max(0.1, timeout - delay))] = backup
+            with self._lock: self._stats[backup].hedges += 1
+        pending, error = set(futs), None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                if fut.exception() is None:
+                    name = futs[fut]
+                    if fut is not first:
+                        with self._lock: self._stats[name].hedge_wins += 1
+                    for other in pending: other.cancel()  # a started loser just finishes and is dropped
+                    return fut.result(), name
+                error = fut.exception()
+        raise error
+
+    def stream(self, prompt: str, **kwargs):
+        # streaming isn't hedged: the first model to speak owns the page
+        name = self.ranked()[0]
+        t0 = time.perf_counter()
+        try:
+            resp = self._models[name].generate_content(
+                prompt, generation_config=self.generation_config, safety_settings=self.safety_settings,
+                stream=True, **kwargs
+            )
+            for chunk in resp:
+                yield chunk
+        except Exception as e:
+            self._record(name, False)
+            _blame(e, name)
+            raise
+        self._record(name, True, time.perf_counter() - t0)
+
+    # ---------- model list (cached; never fetched on the error path)
+    def available_models(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._available is not None and now - self._listed_at < MODEL_LIST_TTL_S:
+                return self._available
+        try:
+            names = [m.name for m in self.genai.list_models()
+                     if "generateContent" in getattr(m, "supported_generation_methods", ())]
+        except Exception:
+            names = None
+        with self._lock:
+            if names is not None: self._available = names
+            self._listed_at = now
+            return self._available or []
+
+    def cached_models(self):
+        with self._lock:
+            return list(self._available or [])
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {name: {"calls": s.calls, "errors": s.errors, "p50_s": s.pct(0.5), "p95_s": s.pct(0.95),
+                           "healthy": s.healthy(now), "hedges": s.hedges, "hedge_wins": s.hedge_wins}
+                    for name, s in self._stats.items()}
@@ -0,0 +1,164 @@
+import random, threading, time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+from admission import is_retryable, is_throttled
+
+# ======================
+# Shared outbound HTTP: keep-alive pools per host, per-endpoint timeouts,
+# bounded retries and a circuit breaker per upstream
+# ======================
+class CircuitOpen(Exception):
+    pass
+
+class Policy:
+    __slots__ = ("connect_s", "read_s", "retries", "backoff_s", "max_backoff_s", "trip_on_throttle")
+
+    def __init__(self, connect_s=3.05, read_s=20.0, retries=1, backoff_s=0.5, max_backoff_s=4.0,
+                 trip_on_throttle=True):
+        self.connect_s, self.read_s, self.retries = connect_s, read_s, retries
+        self.backoff_s, self.max_backoff_s = backoff_s, max_backoff_s
+        # False when something else (the admission controller) already paces and retries 429s
+        self.trip_on_throttle = trip_on_throttle
+
+class CircuitBreaker:
+    # closed -> open after `threshold` failures in a row; one trial call after reset_s (half-open)
+    def __init__(self, threshold: int = 5, reset_s: float = 30.0):
+        self.threshold, self.reset_s = threshold, reset_s
+        self.failures, self.opened_at, self.trial = 0, None, False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None: return "closed"
+            return "half-open" if time.monotonic() - self.opened_at >= self.reset_s else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None: return True
+            if time.monotonic() - self.opened_at < self.reset_s or self.trial: return False
+            self.trial = True
+            return True
+
+    def record(self, ok: bool) -> bool:
+        # -> True when this call (re)opened the breaker
+        with self._lock:
+            self.trial = False
+            if ok:
+                self.failures, self.opened_at = 0, None
+                return False
+            self.failures += 1
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def release(self):
+        # neither success nor failure (e.g. a 429): just hand back a half-open trial slot
+        with self._lock:
+            self.trial = False
+
+def upstream_fault(e: Exception) -> bool:
+    # what counts against a breaker: the upstream is down or overloaded, not a bad request from us
+    return isinstance(e, (requests.ConnectionError, requests.Timeout)) or is_retryable(e)
+
+class HttpClient:
+    def __init__(self, policies: dict = None, pool_size: int = 8, threshold: int = 5, reset_s: float = 30.0,
+                 on_event=None):
+        self.policies = {"default": Policy(), **(policies or {})}
+        # on_event(name, endpoint=...) for breaker opens and short-circuits, e.g. Metrics.inc
+        self.on_event = on_event or (lambda name, **labels: None)
+        self.pool_size, self.threshold, self.reset_s = pool_size, threshold, reset_s
+        self._sessions, self._breakers, self._stats = {}, {}, {}
+        self._lock = threading.Lock()
+
+    def session(self, url: str) -> requests.Session:
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            s = self._sessions.get(host)
+            if s is None:
+                s = self._sessions[host] = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                s.mount("https://", adapter)
+                s.mount("http://", adapter)
+            return s
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        with self._lock:
+            b = self._breakers.get(endpoint)
+            if b is None: b = self._breakers[endpoint] = CircuitBreaker(self.threshold, self.reset_s)
+            return b
+
+    def healthy(self, endpoint: str) -> bool:
+        return self.breaker(endpoint).state != "open"
+
+    def _stat(self, endpoint: str, **inc):
+        with self._lock:
+            st = self._stats.setdefault(endpoint, {"calls": 0, "ok": 0, "failures": 0, "retries": 0,
+                                                   "short_circuits": 0, "latency_total_s": 0.0, "latency_max_s": 0.0})
+            for k, v in inc.items():
+                if k == "latency_s":
+                    st["latency_total_s"] += v
+                    st["latency_max_s"] = max(st["latency_max_s"], v)
+                else:
+                    st[k] += v
+
+    def guard(self, endpoint: str, fn):
+        # breaker + retries + latency for any upstream call, HTTP or not (Gemini goes through here too)
+        policy = self.policies.get(endpoint, self.policies["default"])
+        breaker = self.breaker(endpoint)
+        for attempt in range(policy.retries + 1):
+            if not breaker.allow():
+                self._stat(endpoint, short_circuits=1)
+                self.on_event("breaker_short_circuits", endpoint=endpoint)
+                raise CircuitOpen(f"{endpoint} is unhealthy, skipping for now")
+            t0 = time.perf_counter()
+            try:
+                out = fn(policy)
+            except Exception as e:
+                fault = upstream_fault(e)
+                if fault and not policy.trip_on_throttle and is_throttled(e):
+                    breaker.release()
+                elif breaker.record(not fault):
+                    self.on_event("breaker_opens", endpoint=endpoint)
+                self._stat(endpoint, calls=1, failures=1, latency_s=time.perf_counter() - t0)
+                if not fault or attempt == policy.retries: raise
+                self._stat(endpoint, retries=1)
+                time.sleep(random.uniform(0, min(policy.max_backoff_s, policy.backoff_s * 2 ** attempt)))
+                continue
+            breaker.record(True)
+            self._stat(endpoint, calls=1, ok=1, latency_s=time.perf_counter() - t0)
+            return out
+
+    def request(self, endpoint: str, method: str, url: str, **kwargs) -> requests.Response:
+        def send(policy):
+            r = self.session(url).request(method, url, timeout=(policy.connect_s, policy.read_s), **kwargs)
+            r.raise_for_status()
+            return r
+        return self.guard(endpoint, send)
+
+    def get(self, endpoint: str, url: str, **kwargs) -> requests.Response:
+        return self.request(endpoint, "GET", url, **kwargs)
+
+    def post(self, endpoint: str, url: str, **kwargs) -> requests.Response:
+        return self.request(endpoint, "POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {ep: dict(v) for ep, v in self._stats.items()}
+            sessions = dict(self._sessions)
+            breakers = dict(self._breakers)
+        for ep, st in out.items():
+            st["latency_avg_s"] = st["latency_total_s"] / st["calls"] if st["calls"] else 0.0
+            st["breaker"] = breakers[ep].state if ep in breakers else "closed"
+        pools = {}
+        for host, s in sessions.items():
+            # num_connections = sockets opened, num_requests = requests sent over them
+            manager = s.get_adapter(host).poolmanager
+            conns = [manager.pools[k] for k in manager.pools.keys()]
+            pools[host] = {"connections": sum(p.num_connections for p in conns),
+                           "requests": sum(p.num_requests for p in conns)}
+        return {"endpoints": out, "pools": pools}
@@ -0,0 +1,109 @@
+import hashlib, json, math, os, sqlite3, threading, time
+
+# ======================
+# Disk-backed itinerary cache, shared by every session and surviving restarts
+# ======================
+BUDGET_STEP = 0.15  # budgets within ~15% of each other land in the same bucket
+
+def _norm(s) -> str:
+    return " ".join(str(s or "").split()).casefold()
+
+def _norm_list(items) -> list:
+    return sorted({_norm(x) for x in (items or []) if _norm(x)})
+
+def budget_bucket(amount: float) -> int:
+    # log-spaced buckets, so the tolerance is relative rather than absolute
+    if not amount or amount <= 0: return 0
+    return round(math.log(amount) / math.log(1 + BUDGET_STEP))
+
+def trip_cache_key(destination, duration, people, budget_dest_currency, dest_currency_code, travel_vibe,
+                   accommodation, pace, origin_country, origin_city, transport_to_dest, travel_month,
+                   food_prefs, transport_prefs_local, special_requests, namespace: str = "") -> str:
+    # canonical form of the build_prompt inputs; namespace carries model / prompt version
+    canon = {
+        "ns": namespace,
+        "destination": _norm(destination),
+        "duration": int(duration),
+        "people": int(people),
+        "budget": [budget_bucket(budget_dest_currency), _norm(dest_currency_code)],
+        "vibe": _norm_list(travel_vibe),
+        "stay": _norm_list(accommodation),
+        "pace": _norm(pace),
+        "origin": [_norm(origin_city), _norm(origin_country)],
+        "arrival": _norm(transport_to_dest),
+        "month": _norm(travel_month),
+        "food": _norm_list(food_prefs),
+        "local_transport": _norm(transport_prefs_local),
+        "requests": _norm(special_requests),
+    }
+    blob = json.dumps(canon, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class ItineraryCache:
+    def __init__(self, path: str, max_entries: int = 500, max_bytes: int = 50_000_000, ttl_s: float = 7 * 86400):
+        self.path, self.max_entries, self.max_bytes, self.ttl_s = path, max_entries, max_bytes, ttl_s
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS itineraries ("
+            " key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, last_hit REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS itineraries_lru ON itineraries(last_hit)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def _bump(self, name: str):
+        self._db.execute(
+            "INSERT INTO stats(name, value) VALUES(?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,)
+        )
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT text, created FROM itineraries WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] > self.ttl_s:
+                self._db.execute("DELETE FROM itineraries WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._bump("misses")
+                return None
+            self._db.execute("UPDATE itineraries SET last_hit = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self._bump("hits")
+            return row[0]
+
+    def put(self, key: str, text: str):
+        if not text: return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO itineraries(key, text, size, created, last_hit, hits) VALUES(?, ?, ?, ?, ?, 0)",
+                (key, text, len(text.encode("utf-8")), now, now),
+            )
+            self._bump("writes")
+            self._evict(now)
+
+    def _evict(self, now: float):
+        cur = self._db.execute("DELETE FROM itineraries WHERE created < ?", (now - self.ttl_s,))
+        evicted = max(cur.rowcount, 0)
+        count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM itineraries").fetchone()
+        # least recently used first until both the entry and the byte budget fit
+        for key, size in self._db.execute("SELECT key, size FROM itineraries ORDER BY last_hit").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes: break
+            self._db.execute("DELETE FROM itineraries WHERE key = ?", (key,))
+            count, total, evicted = count - 1, total - size, evicted + 1
+        for _ in range(evicted): self._bump("evictions")
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._db.execute("SELECT name, value FROM stats").fetchall())
+            out["entries"], out["bytes"] = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM itineraries"
+            ).fetchone()
+        for k in ("hits", "misses", "writes", "evictions"): out.setdefault(k, 0)
+        return out
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM itineraries")
@@ -0,0 +1,145 @@
+import functools, re
+
+# ======================
+# One-pass structured view of a generated itinerary (sections -> days -> items)
+# ======================
+HEADING = re.compile(r"^\s*#{1,6}\s*(🎉|🗺|✨)")
+DAY_LINE = re.compile(r"^\s*(?:[-*]\s+)?(?:#{1,6}\s*)?\**\s*Day\s+(\d+)\b", re.IGNORECASE)
+SECTION_KEYS = {"🎉": "overview", "🗺": "itinerary", "✨": "tips"}
+OVERVIEW, ITINERARY, TIPS = "Overview", "Itinerary", "Tips"
+
+def plain_line(line: str) -> str:
+    # same rules as markdown_to_plain: drop bold/underline markers and every '#'
+    s = line.replace("**", "").replace("__", "")
+    return s.replace("###", "").replace("##", "").replace("#", "").lstrip()
+
+class Item:
+    __slots__ = ("kind", "line")  # kind: "heading" | "bullet" | "text" | "blank"; line indexes doc.lines
+
+    def __init__(self, kind, line):
+        self.kind, self.line = kind, line
+
+class Day:
+    __slots__ = ("number", "start", "end", "items")
+
+    def __init__(self, number, start):
+        self.number, self.start, self.end, self.items = number, start, start + 1, []
+
+    @property
+    def label(self):
+        return f"Day {self.number}"
+
+class Section:
+    __slots__ = ("key", "start", "end", "head", "days", "items")
+
+    def __init__(self, key, start, head=None):
+        self.key, self.start, self.end, self.head, self.days, self.items = key, start, start, head, [], []
+
+    @property
+    def found(self):
+        return self.head is not None
+
+class ItineraryDoc:
+    __slots__ = ("raw", "lines", "plain", "sections", "_cache")
+
+    def __init__(self, raw, lines, plain, sections):
+        self.raw, self.lines, self.plain, self.sections, self._cache = raw, lines, plain, sections, {}
+
+    def text(self, start, end):
+        return "\n".join(self.lines[start:end])
+
+    def section(self, key):
+        return self.sections.get(key)
+
+    @property
+    def structured(self):
+        return any(s.found for s in self.sections.values()) or bool(self.days)
+
+    @property
+    def days(self):
+        sec = self.sections.get("itinerary")
+        return sec.days if sec else []
+
+    def section_markdown(self, key) -> str:
+        # what each tab shows; mirrors the old split on "### 🎉" / "### 🗺️" / "### ✨"
+        if key not in self._cache:
+            sec = self.sections.get(key)
+            if sec is None or sec.end <= sec.start:
+                out = ""
+            elif key == "overview" and sec.found:
+                first = self.lines[sec.head].split("🎉", 1)[-1]
+                out = "\n".join([first, *self.lines[sec.head + 1:sec.end]])
+            else:
+                out = self.text(sec.start, sec.end)
+            if out and sec.end < len(self.lines): out += "\n"  # the split kept the newline before the next heading
+            self._cache[key] = out
+        return self._cache[key]
+
+    def blocks(self):
+        # [(label, markdown, plain)] covering every line in order: Overview, Itinerary intro, Day N..., Tips
+        if "blocks" in self._cache: return self._cache["blocks"]
+        cuts = []
+        for key, label in (("overview", OVERVIEW), ("itinerary", ITINERARY), ("tips", TIPS)):
+            sec = self.sections.get(key)
+            if sec is None: continue
+            cuts.append((label, sec.start))
+            for day in sec.days: cuts.append((day.label, day.start))
+        cuts.sort(key=lambda c: c[1])
+        if not cuts or cuts[0][1] > 0:
+            # anything ahead of the first heading rides along with the overview
+            cuts = [(OVERVIEW, 0)] + [c for c in cuts if c[0] != OVERVIEW]
+        out = []
+        for i, (label, start) in enumerate(cuts):
+            end = cuts[i + 1][1] if i + 1 < len(cuts) else len(self.lines)
+            if end <= start and out: continue
+            out.append((label, self.text(start, end), "\n".join(self.plain[start:end])))
+        self._cache["blocks"] = out
+        return out
+
+@functools.lru_cache(maxsize=16)
+def parse_itinerary(raw: str) -> ItineraryDoc:
+    lines = raw.splitlines()
+    plain = []
+    sections = {}
+    current, day = None, None
+    seen_days = set()
+    # a "Day N" line may only open a heading-less itinerary when the model really left the heading out;
+    # otherwise "**Day 1 tip:**" in the overview would cut the overview short
+    has_itinerary_heading = any(m.group(1) == "🗺" for m in map(HEADING.match, lines) if m)
+    for i, line in enumerate(lines):
+        plain.append(plain_line(line))
+        m = HEADING.match(line)
+        key = SECTION_KEYS[m.group(1)] if m else None
+        if key == "overview" and current is not None and current.key == "overview" and not current.found:
+            current.head = i  # text ahead of the overview heading stays with the overview block
+            current.items.append(Item("heading", i))
+            continue
+        if key and key not in sections:
+            if current: current.end = i
+            if day: day.end, day = i, None
+            current = sections[key] = Section(key, i, head=i)
+            current.items.append(Item("heading", i))
+            continue
+        d = DAY_LINE.match(line)
+        if d and (current is None or current.key != "tips"):
+            if current is None or current.key != "itinerary":
+                if "itinerary" in sections or has_itinerary_heading:
+                    d = None  # a stray "Day N" mention outside the itinerary
+                else:
+                    # the model dropped the itinerary heading: the days start here
+                    if current: current.end = i
+                    current = sections["itinerary"] = Section("itinerary", i)
+            if d:
+                number = int(d.group(1))
+                if number not in seen_days:
+                    seen_days.add(number)
+                    if day: day.end = i
+                    day = Day(number, i)
+                    current.days.append(day)
+        if current is None:
+            current = sections["overview"] = Section("overview", i)
+        kind = "blank" if not line.strip() else "bullet" if line.lstrip()[:2] in ("- ", "* ") else "text"
+        (day.items if day else current.items).append(Item(kind, i))
+    if current: current.end = len(lines)
+    if day: day.end = len(lines)
+    return ItineraryDoc(raw, lines, plain, sections)
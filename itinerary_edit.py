@@ -0,0 +1,43 @@
+from itinerary_doc import parse_itinerary, ITINERARY
+
+# ======================
+# Editing one day / section of a generated itinerary in place
+# ======================
+SUMMARY_CHARS = 110
+
+def split_blocks(raw: str):
+    # -> [(label, text)] where "\n".join(texts) == "\n".join(raw.splitlines())
+    return [(label, text) for label, text, _ in parse_itinerary(raw).blocks()]
+
+def edit_targets(blocks):
+    # the itinerary heading/intro block only holds the title, so it isn't offered
+    return [label for label, _ in blocks if label != ITINERARY]
+
+def trip_inputs_block(prompt: str) -> str:
+    head, sep, tail = prompt.partition("--- TRIP INPUTS ---")
+    return (sep + tail.split("--- RULES ---", 1)[0]).strip() if sep else ""
+
+def _summary(text: str) -> str:
+    first = next((l.strip() for l in text.splitlines() if l.strip() and not l.startswith("###")), "")
+    return first if len(first) <= SUMMARY_CHARS else first[:SUMMARY_CHARS - 1] + "…"
+
+def edit_prompt(trip_inputs: str, blocks, target: str, instruction: str) -> str:
+    outline = "\n".join(
+        f"{'>>' if label == target else '- '} {label}: {_summary(text)}" for label, text in blocks if label != ITINERARY
+    )
+    current = dict(blocks)[target]
+    return (
+        f"You are NomadSquad, an adventurous, witty, emoji-loving travel planner. Lean funny and friendly.\n"
+        f"{trip_inputs}\n"
+        f"--- REST OF THE PLAN (one line each, keep it consistent) ---\n{outline}\n"
+        f"--- PART TO REWRITE: {target} ---\n{current}\n"
+        f"--- CHANGE REQUESTED ---\n{instruction or 'Make it fresher and more fun, same facts.'}\n"
+        f"Reply with ONLY the rewritten {target} part, starting with the same heading line format "
+        f"(e.g. '{current.strip().splitlines()[0][:60] if current.strip() else target}'). No other sections."
+    )
+
+def splice(blocks, target: str, new_text: str) -> str:
+    # keeps the blank lines that separated the old block from the next one
+    return "\n".join(
+        new_text.strip() + text[len(text.rstrip()):] if label == target else text for label, text in blocks
+    ).strip()
@@ -0,0 +1,93 @@
+import threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import QueueFull
+
+# ======================
+# Process-level background jobs: generation runs here, pages only poll
+# ======================
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+class Job:
+    __slots__ = ("id", "kind", "status", "result", "error", "progress", "created", "finished_at",
+                 "meta", "_cancel", "_lock", "future")
+
+    def __init__(self, kind: str, meta: dict = None):
+        self.id, self.kind, self.meta = uuid.uuid4().hex, kind, meta or {}
+        self.status, self.result, self.error = QUEUED, None, None
+        self.progress = {}
+        self.created, self.finished_at = time.time(), None
+        self._cancel, self._lock = threading.Event(), threading.Lock()
+        self.future = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def update(self, **fields):
+        # called from the worker; pages read a snapshot()
+        with self._lock: self.progress.update(fields)
+
+    def snapshot(self) -> dict:
+        with self._lock: return dict(self.progress)
+
+class JobStore:
+    def __init__(self, max_workers: int = 4, max_pending: int = 32, ttl_s: float = 900):
+        self.max_pending, self.ttl_s = max_pending, ttl_s
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nomadsquad-jobs")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn, *args, meta: dict = None, **kwargs) -> Job:
+        # fn(job, *args, **kwargs) -> result; it should check job.cancelled between upstream calls
+        self._purge()
+        job = Job(kind, meta)
+        with self._lock:
+            if sum(not j.finished for j in self._jobs.values()) >= self.max_pending:
+                raise QueueFull(f"{self.max_pending} jobs already running")
+            self._jobs[job.id] = job
+            job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancelled:
+            # cancelled after the pool picked it up but before it started; cancel() couldn't mark it
+            job.status, job.finished_at = CANCELLED, time.time()
+            return
+        job.status = RUNNING
+        try:
+            result = fn(job, *args, **kwargs)
+            job.result, job.status = result, (CANCELLED if job.cancelled else DONE)
+        except Exception as e:
+            job.error, job.status = str(e) or type(e).__name__, FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str):
+        self._purge()
+        with self._lock: return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        # a queued job never starts; a running one stops at its next check and its result is dropped
+        job = self.get(job_id)
+        if job is None or job.finished: return False
+        job._cancel.set()
+        if job.future.cancel():
+            job.status, job.finished_at = CANCELLED, time.time()
+        return True
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl_s
+        with self._lock:
+            for jid in [jid for jid, j in self._jobs.items() if j.finished_at and j.finished_at < cutoff]:
+                del self._jobs[jid]
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = {s: 0 for s in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+            for j in self._jobs.values(): out[j.status] += 1
+        return out
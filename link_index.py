@@ -0,0 +1,167 @@
+import hashlib, json, math, os, sqlite3, threading, time
+
+from itinerary_cache import _norm, _norm_list
+
+# ======================
+# Local index of researched booking/review links: exact filter matches first,
+# then any fresh links for the same destination, upstream only on a miss
+# ======================
+RATING_STEP = 0.5  # 4.0-4.4 share an entry, 4.5-4.9 the next; the filter is a hint to Perplexity, not a hard cut
+
+def link_query_key(destination, accommodation, min_rating, must_have) -> str:
+    canon = [_norm(destination), _norm_list(accommodation), math.floor(float(min_rating or 0) / RATING_STEP),
+             _norm_list(must_have)]
+    return hashlib.sha256(json.dumps(canon, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def _fts_terms(destination: str) -> str:
+    # "Paris, France" -> '"paris" "france"' (every word must match, quoted so punctuation can't break MATCH)
+    words = "".join(c if c.isalnum() else " " for c in _norm(destination)).split()
+    return " ".join(f'"{w}"' for w in words)
+
+class LinkIndex:
+    def __init__(self, path: str, ttl_s: float = 3 * 86400, similar_ttl_s: float = 86400, min_similar: int = 4,
+                 max_queries: int = 2000):
+        # exact filter matches stay good for ttl_s; borrowing another query's links needs fresher data
+        self.path, self.ttl_s, self.similar_ttl_s, self.min_similar = path, ttl_s, similar_ttl_s, min_similar
+        self.max_queries = max_queries
+        self._lock = threading.Lock()
+        self._lookup_total_s, self._lookups = 0.0, 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            " url TEXT PRIMARY KEY, title TEXT NOT NULL, date TEXT NOT NULL, destination TEXT NOT NULL,"
+            " first_seen REAL NOT NULL, last_seen REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS queries ("
+            " key TEXT PRIMARY KEY, destination TEXT NOT NULL, fetched REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS query_links (key TEXT NOT NULL, url TEXT NOT NULL, rank INTEGER NOT NULL,"
+            " PRIMARY KEY(key, url))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS query_links_url ON query_links(url)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS queries_fetched ON queries(fetched)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS links_last_seen ON links(last_seen)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        try:
+            self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS links_fts USING fts5(destination, title, url UNINDEXED)")
+            self.fts = True
+        except sqlite3.OperationalError:  # sqlite built without FTS5: fall back to a destination LIKE
+            self.fts = False
+
+    def _bump(self, name: str):
+        self._db.execute(
+            "INSERT INTO stats(name, value) VALUES(?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,)
+        )
+
+    def lookup(self, destination, accommodation, min_rating, must_have, k: int = 8):
+        # -> list of {"title", "url", "date"}, or None when upstream should be asked
+        t0 = time.perf_counter()
+        now = time.time()
+        key = link_query_key(destination, accommodation, min_rating, must_have)
+        with self._lock:
+            row = self._db.execute("SELECT fetched FROM queries WHERE key = ?", (key,)).fetchone()
+            stale = row is not None and now - row[0] > self.ttl_s
+            rows = self._db.execute(
+                "SELECT l.title, l.url, l.date FROM query_links q JOIN links l ON l.url = q.url"
+                " WHERE q.key = ? ORDER BY q.rank LIMIT ?", (key, k)
+            ).fetchall() if row and not stale else []
+            if rows:
+                self._db.execute("UPDATE queries SET hits = hits + 1 WHERE key = ?", (key,))
+                self._bump("hits")
+            else:  # a fresh entry with no usable links is a miss too
+                rows = self._similar(destination, now, k)
+                self._bump("similar_hits" if rows else ("stale" if stale else "misses"))
+            self._lookups += 1
+            self._lookup_total_s += time.perf_counter() - t0
+        return [{"title": t, "url": u, "date": d} for t, u, d in rows] if rows else None
+
+    def _similar(self, destination, now: float, k: int):
+        # same destination, other filters: only if enough fresh links exist to be worth showing
+        cutoff = now - self.similar_ttl_s
+        if self.fts:
+            terms = _fts_terms(destination)
+            if not terms: return []
+            # MATCH narrows the candidates; the equality keeps "York" from borrowing "New York" links,
+            # same as the fallback below
+            rows = self._db.execute(
+                "SELECT l.title, l.url, l.date FROM links_fts f JOIN links l ON l.url = f.url"
+                " WHERE links_fts MATCH ? AND l.destination = ? AND l.last_seen >= ? ORDER BY l.last_seen DESC LIMIT ?",
+                (f"destination : ({terms})", _norm(destination), cutoff, k),
+            ).fetchall()
+        else:
+            rows = self._db.execute(
+                "SELECT title, url, date FROM links WHERE destination = ? AND last_seen >= ?"
+                " ORDER BY last_seen DESC LIMIT ?", (_norm(destination), cutoff, k),
+            ).fetchall()
+        return rows if len(rows) >= min(k, self.min_similar) else []
+
+    def store(self, destination, accommodation, min_rating, must_have, links):
+        if not links: return
+        now = time.time()
+        key = link_query_key(destination, accommodation, min_rating, must_have)
+        dest = _norm(destination)
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("INSERT OR REPLACE INTO queries(key, destination, fetched, hits) VALUES(?, ?, ?, 0)",
+                                 (key, dest, now))
+                self._db.execute("DELETE FROM query_links WHERE key = ?", (key,))
+                for rank, it in enumerate(links):
+                    url = (it.get("url") or "").strip()
+                    if not url or url == "#": continue
+                    new = self._db.execute(
+                        "INSERT INTO links(url, title, date, destination, first_seen, last_seen) VALUES(?, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT(url) DO UPDATE SET title = excluded.title, date = excluded.date,"
+                        " last_seen = excluded.last_seen RETURNING first_seen = last_seen",
+                        (url, it.get("title") or "Link", it.get("date") or "", dest, now, now),
+                    ).fetchone()[0]
+                    if new and self.fts:
+                        self._db.execute("INSERT INTO links_fts(destination, title, url) VALUES(?, ?, ?)",
+                                         (dest, it.get("title") or "", url))
+                    self._db.execute("INSERT OR IGNORE INTO query_links(key, url, rank) VALUES(?, ?, ?)", (key, url, rank))
+                self._bump("writes")
+                self._evict(now)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _evict(self, now: float):
+        # queries past ttl_s, then the oldest beyond max_queries; links go once no query holds them
+        # and they're too old to be borrowed by _similar
+        cur = self._db.execute("DELETE FROM queries WHERE fetched < ?", (now - self.ttl_s,))
+        evicted = max(cur.rowcount, 0)
+        over = self._db.execute("SELECT COUNT(*) FROM queries").fetchone()[0] - self.max_queries
+        if over > 0:
+            cur = self._db.execute(
+                "DELETE FROM queries WHERE key IN (SELECT key FROM queries ORDER BY fetched LIMIT ?)", (over,))
+            evicted += max(cur.rowcount, 0)
+        if evicted:
+            self._db.execute("DELETE FROM query_links WHERE key NOT IN (SELECT key FROM queries)")
+        urls = [u for (u,) in self._db.execute(
+            "SELECT url FROM links WHERE last_seen < ? AND url NOT IN (SELECT url FROM query_links)",
+            (now - self.similar_ttl_s,),
+        ).fetchall()]
+        for i in range(0, len(urls), 500):
+            batch = urls[i:i + 500]
+            marks = ",".join("?" * len(batch))
+            self._db.execute(f"DELETE FROM links WHERE url IN ({marks})", batch)
+            if self.fts: self._db.execute(f"DELETE FROM links_fts WHERE url IN ({marks})", batch)
+        for _ in range(evicted): self._bump("evictions")
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._db.execute("SELECT name, value FROM stats").fetchall())
+            out["links"] = self._db.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+            out["queries"] = self._db.execute("SELECT COUNT(*) FROM queries").fetchone()[0]
+            lookups, total = self._lookups, self._lookup_total_s
+        for k in ("hits", "similar_hits", "misses", "stale", "writes", "evictions"): out.setdefault(k, 0)
+        served = out["hits"] + out["similar_hits"]
+        asked = served + out["misses"] + out["stale"]
+        out["hit_rate"] = served / asked if asked else 0.0
+        out["lookup_avg_ms"] = total / lookups * 1000 if lookups else 0.0
+        return out
@@ -0,0 +1,119 @@
+import re, time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeout
+
+# ======================
+# Long trips: skeleton first, then day blocks in parallel, stitched back
+# into the three headings the render code splits on
+# ======================
+LONG_TRIP_DAYS = 8     # longer trips don't fit one 4096-token answer
+DAYS_PER_CHUNK = 4
+THEMES_MARKER = "### 🧭"
+THEME_LINE = re.compile(r"^\W*Day\s*(\d+)\W+(.+)$", re.IGNORECASE)
+
+def day_chunks(duration: int, size: int = DAYS_PER_CHUNK):
+    return [(a, min(a + size - 1, duration)) for a in range(1, duration + 1, size)]
+
+def itinerary_heading(duration: int) -> str:
+    return f"### 🗺️ Your Awesome {duration}-Day Adventure Itinerary! 🗺️"
+
+def skeleton_prompt(base_prompt: str, duration: int) -> str:
+    return (
+        f"{base_prompt}\n"
+        f"--- THIS REQUEST ---\n"
+        f"Do NOT write the day-by-day plan yet; it is written separately. Reply with exactly these headings:\n"
+        f"### 🎉 Your NomadSquad Trip Overview & Seasonal Intel! 🎉\n"
+        f"{THEMES_MARKER} Day Themes\n"
+        f"(one line per day, 'Day N: theme — area', for all {duration} days, no extra text)\n"
+        f"### ✨ NomadSquad's Pro Tips & Essential Info! ✨"
+    )
+
+def chunk_prompt(base_prompt: str, duration: int, start: int, end: int, themes: dict) -> str:
+    outline = "\n".join(f"Day {d}: {themes.get(d, 'free exploring')}" for d in range(1, duration + 1))
+    closing = f"End Day {end} with one fun one-liner in local flavor." if end == duration else \
+              "Do not add a closing one-liner; the plan continues after these days."
+    return (
+        f"{base_prompt}\n"
+        f"--- THIS REQUEST ---\n"
+        f"The overview and tips are already written. Write ONLY Day {start} to Day {end} of the DAILY ITINERARY, "
+        f"each starting with **Day N**, no section headings.\n"
+        f"Whole-trip outline (follow it, don't repeat other days' highlights):\n{outline}\n"
+        f"{closing}"
+    )
+
+def parse_skeleton(text: str, duration: int):
+    # -> (overview, themes, tips); tolerant of a missing themes or tips heading
+    head, sep, tail = text.partition("### ✨")
+    overview, _, themes_part = head.partition(THEMES_MARKER)
+    tips = sep + tail
+    themes = {}
+    for line in themes_part.splitlines():
+        m = THEME_LINE.match(line.strip())
+        if m and 1 <= int(m.group(1)) <= duration:
+            themes[int(m.group(1))] = m.group(2).strip()
+    return overview.strip(), themes, tips.strip()
+
+def missing_block(start: int, end: int) -> str:
+    days = f"Day {start}" if start == end else f"Days {start}–{end}"
+    return f"**{days}** — _NomadSquad lost this part of the map. Use “Retry missing days” to fill it in._"
+
+def stitch(plan: dict) -> str:
+    days = [plan["chunks"].get(a) or missing_block(a, b) for a, b in day_chunks(plan["duration"], plan["chunk_size"])]
+    return "\n\n".join([plan["overview"], itinerary_heading(plan["duration"]), *days, plan["tips"]]).strip()
+
+def _fill_chunks(plan: dict, spans, generate, max_parallel: int, retries: int, deadline: float, on_progress):
+    def one(span):
+        a, b = span
+        prompt = chunk_prompt(plan["base_prompt"], plan["duration"], a, b, plan["themes"])
+        err = None
+        for _ in range(retries + 1):
+            text, err = generate(prompt)
+            if text: return text, None
+        return None, err
+
+    done, errors = 0, []
+    ex = ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="nomadsquad-days")
+    futs = {ex.submit(one, span): span for span in spans}
+    try:
+        for fut in as_completed(futs, timeout=max(0.0, deadline - time.perf_counter()) if deadline else None):
+            text, err = fut.result()
+            if text: plan["chunks"][futs[fut][0]] = text
+            else: errors.append(err)
+            done += 1
+            if on_progress: on_progress(done, len(spans))
+    except FutureTimeout:
+        errors.append("some days ran past the deadline")
+    finally:
+        # late blocks are dropped; they show up in plan["failed"] for a retry
+        ex.shutdown(wait=False, cancel_futures=True)
+    plan["failed"] = [s for s in day_chunks(plan["duration"], plan["chunk_size"]) if s[0] not in plan["chunks"]]
+    return errors
+
+def generate_long_trip(base_prompt: str, duration: int, generate, max_parallel: int = 4, retries: int = 1,
+                       deadline: float = None, on_progress=None, chunk_size: int = DAYS_PER_CHUNK):
+    # generate(prompt) -> (text, err); returns (stitched_text, err, plan)
+    skel, err = generate(skeleton_prompt(base_prompt, duration))
+    if not skel:
+        return None, err, None
+    overview, themes, tips = parse_skeleton(skel, duration)
+    plan = {"base_prompt": base_prompt, "duration": duration, "chunk_size": chunk_size,
+            "overview": overview, "themes": themes, "tips": tips, "chunks": {}, "failed": []}
+    errors = _fill_chunks(plan, day_chunks(duration, chunk_size), generate, max_parallel, retries, deadline, on_progress)
+    if not plan["chunks"]:
+        return None, errors[0] if errors else "No day blocks came back.", plan
+    return stitch(plan), None, plan
+
+def retry_failed(plan: dict, generate, max_parallel: int = 4, retries: int = 1, deadline: float = None, on_progress=None,
+                 current: str = None):
+    # regenerates only the day blocks that are still missing; with `current` (the text on screen, edits and all)
+    # each new block replaces its placeholder there instead of the plan being stitched again from scratch
+    spans = list(plan["failed"])
+    errors = _fill_chunks(plan, spans, generate, max_parallel, retries, deadline, on_progress)
+    err = errors[0] if errors else None
+    if current is None: return stitch(plan), err
+    for a, b in spans:
+        if a in plan["chunks"]: current = current.replace(missing_block(a, b), plan["chunks"][a].strip(), 1)
+    return current, err
+
+def pending_blocks(plan: dict, text: str):
+    # failed spans whose placeholder is still in text; an edit that rewrote one takes it off the retry list
+    return [s for s in plan["failed"] if missing_block(*s) in text]
@@ -0,0 +1,156 @@
+import bisect, json, os, threading, time
+from contextlib import contextmanager
+
+# ======================
+# Stage timings and sizes aggregated into fixed-bucket histograms (process-wide),
+# exported as Prometheus text or JSON for scraping / sizing under real load
+# ======================
+PREFIX = "nomadsquad_"
+SECONDS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+TOKENS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+BYTES = (16e3, 64e3, 256e3, 1e6, 4e6, 16e6)
+PAGES = (1, 2, 4, 8, 16, 32, 64)
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot is +Inf
+        self.count, self.sum = 0, 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float):
+        # linear within the bucket, like Prometheus' histogram_quantile
+        if not self.count: return None
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(self.bounds): return self.bounds[-1]
+                lo = self.bounds[i - 1] if i else 0.0
+                return lo + (self.bounds[i] - lo) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hists, self._counters = {}, {}
+        self._collectors = []
+
+    # ---------- recording
+    def record(self, name: str, value: float, bounds=SECONDS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._hists.get(key)
+            if h is None: h = self._hists[key] = Histogram(bounds)
+            h.observe(value)
+
+    def observe(self, stage: str, seconds: float, ok: bool = True, **labels):
+        self.record("stage_seconds", seconds, stage=stage, outcome="ok" if ok else "error", **labels)
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.observe(stage, time.perf_counter() - t0, False, **labels)
+            raise
+        self.observe(stage, time.perf_counter() - t0, True, **labels)
+
+    def inc(self, name: str, n: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock: self._counters[key] = self._counters.get(key, 0) + n
+
+    def collect(self, fn):
+        # fn() -> {group: {field: number}}, read at export time as gauges
+        self._collectors.append(fn)
+
+    # ---------- reading
+    def stages(self) -> dict:
+        # stage -> {count, p50_s, p95_s, avg_s}, ok and error outcomes together
+        merged = {}
+        with self._lock:
+            for (name, labels), h in self._hists.items():
+                if name != "stage_seconds": continue
+                stage = dict(labels)["stage"]
+                m = merged.setdefault(stage, Histogram(h.bounds))
+                m.counts = [a + b for a, b in zip(m.counts, h.counts)]
+                m.count += h.count
+                m.sum += h.sum
+        return {s: {"count": h.count, "p50_s": h.quantile(0.5), "p95_s": h.quantile(0.95), "avg_s": h.sum / h.count}
+                for s, h in sorted(merged.items())}
+
+    def _gauges(self):
+        out = []
+        for fn in self._collectors:
+            try: groups = fn()
+            except Exception: continue  # a broken component shouldn't take the export down
+            for group, fields in groups.items():
+                for field, v in fields.items():
+                    if isinstance(v, (int, float)) and not isinstance(v, bool):
+                        out.append((f"{group}_{field}", v))
+        return out
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            hists = [(n, dict(l), list(h.bounds), list(h.counts), h.count, h.sum) for (n, l), h in self._hists.items()]
+            counters = [(n, dict(l), v) for (n, l), v in self._counters.items()]
+        return {
+            "time": time.time(),
+            "histograms": [{"name": n, "labels": l, "bounds": b, "counts": c, "count": cnt, "sum": s}
+                           for n, l, b, c, cnt, s in hists],
+            "counters": [{"name": n, "labels": l, "value": v} for n, l, v in counters],
+            "gauges": dict(self._gauges()),
+        }
+
+    def prometheus(self) -> str:
+        def fmt_labels(labels, **extra):
+            items = list(labels.items()) + list(extra.items())
+            if not items: return ""
+            esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+        snap, lines, typed = self.snapshot(), [], set()
+        for h in sorted(snap["histograms"], key=lambda h: h["name"]):
+            name = PREFIX + h["name"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            acc = 0
+            for bound, n in zip(h["bounds"] + ["+Inf"], h["counts"]):
+                acc += n
+                lines.append(f"{name}_bucket{fmt_labels(h['labels'], le=bound)} {acc}")
+            lines.append(f"{name}_sum{fmt_labels(h['labels'])} {h['sum']}")
+            lines.append(f"{name}_count{fmt_labels(h['labels'])} {h['count']}")
+        for c in sorted(snap["counters"], key=lambda c: c["name"]):
+            name = f"{PREFIX}{c['name']}_total"
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{fmt_labels(c['labels'])} {c['value']}")
+        for field, v in sorted(snap["gauges"].items()):
+            lines.append(f"# TYPE {PREFIX}{field} gauge")
+            lines.append(f"{PREFIX}{field} {v}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        # .prom -> Prometheus text (node_exporter textfile collector), anything else -> JSON
+        body = self.prometheus() if path.endswith(".prom") else json.dumps(self.snapshot(), indent=1)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(body)
+        os.replace(tmp, path)  # a scraper never reads a half-written file
+
+    def export_every(self, path: str, interval_s: float = 15):
+        def loop():
+            while True:
+                time.sleep(interval_s)
+                try: self.export(path)
+                except OSError as e: print(f"⚠️ Metrics export to {path} failed: {e}")
+        threading.Thread(target=loop, name="nomadsquad-metrics", daemon=True).start()
@@ -0,0 +1,199 @@
+import functools, hashlib, io, os, threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from itinerary_doc import parse_itinerary
+from pdf_writer import PdfWriter, TEXT_MEASURE, load_font
+
+# ======================
+# Itinerary -> PDF (vector text, embedded font)
+# ======================
+PDF_PAGE = (595.28, 841.89)   # A4 in points
+PDF_MARGIN = 50
+# (font size, leading) in points
+PDF_TITLE, PDF_HEADING, PDF_BODY = (18, 26), (13, 21), (10.5, 15)
+
+_WORD_WIDTHS = {}  # font -> {word: width}; fonts are long-lived (pdf_font / Pillow fonts)
+
+def _width_cache(font):
+    cache = _WORD_WIDTHS.get(font)
+    if cache is None:
+        if len(_WORD_WIDTHS) >= 32: _WORD_WIDTHS.clear()
+        cache = _WORD_WIDTHS[font] = {}
+    elif len(cache) >= 100_000:
+        cache.clear()
+    return cache
+
+def _hard_break(draw, word, font, max_width, widths):
+    # splits a token wider than the line (long URLs) at character boundaries
+    pieces, start, acc = [], 0, 0.0
+    for i, ch in enumerate(word):
+        w = widths.get(ch)
+        if w is None: w = widths[ch] = draw.textlength(ch, font=font)
+        if acc + w > max_width and i > start:
+            pieces.append(word[start:i])
+            start, acc = i, 0.0
+        acc += w
+    pieces.append(word[start:])
+    return pieces, acc
+
+def wrap_text_to_width(draw, text, font, max_width):
+    # greedy breaking from cumulative word widths: every distinct word is measured once per font,
+    # and only a candidate line that lands within `slack` of the limit is measured in full, so
+    # kerning/rounding can't move a break compared to measuring every candidate line
+    widths = _width_cache(font)
+    space = widths.get(" ")
+    if space is None: space = widths[" "] = draw.textlength(" ", font=font)
+    slack = max(1.0, 0.02 * max_width)
+    lines = []
+    for paragraph in text.split("\n"):
+        if not paragraph:
+            lines.append("")
+            continue
+        line, line_w = [], 0.0
+        for w in paragraph.split(" "):
+            if not w: continue
+            ww = widths.get(w)
+            if ww is None: ww = widths[w] = draw.textlength(w, font=font)
+            cand = line_w + space + ww if line else ww
+            fits = cand <= max_width - slack
+            if not fits and cand <= max_width + slack:
+                cand = draw.textlength(" ".join(line + [w]), font=font)
+                fits = cand <= max_width
+            if fits:
+                line.append(w)
+                line_w = cand
+                continue
+            if line: lines.append(" ".join(line))
+            if ww > max_width:
+                pieces, last_w = _hard_break(draw, w, font, max_width, widths)
+                lines.extend(pieces[:-1])
+                line, line_w = [pieces[-1]], last_w
+            else:
+                line, line_w = [w], ww
+        if line: lines.append(" ".join(line))
+    return lines
+
+def markdown_to_plain(md: str) -> str:
+    # quick-and-simple: strip ** and headings for readable PDF (rules live in itinerary_doc.plain_line)
+    return "\n".join(parse_itinerary(md).plain)
+
+@functools.lru_cache(maxsize=1)
+def pdf_font():
+    # PDF_FONT_PATH may point at any .ttf; Streamlit also exposes root-level secrets as env vars
+    return load_font(os.environ.get("PDF_FONT_PATH"))
+
+@functools.lru_cache(maxsize=512)
+def block_pdf_lines(block_md: str, block_plain: str, max_width: float):
+    # wrapped (style, text) lines of one itinerary block; after an edit only the changed block is laid out again
+    font = pdf_font()
+    out, run = [], []
+
+    def flush():
+        if run:
+            body = font.printable("\n".join(run))
+            out.extend((PDF_BODY, l) for l in wrap_text_to_width(TEXT_MEASURE, body, font.at(PDF_BODY[0]), max_width))
+            run.clear()
+
+    for md, plain in zip(block_md.split("\n"), block_plain.split("\n")):
+        if md.lstrip().startswith("#"):
+            flush()
+            heading = font.printable(plain).strip()
+            out.extend((PDF_HEADING, l) for l in wrap_text_to_width(TEXT_MEASURE, heading, font.at(PDF_HEADING[0]), max_width))
+        else:
+            run.append(plain)
+    flush()
+    return tuple(out)
+
+def pdf_lines(markdown_text: str, title: str, max_width: float):
+    font = pdf_font()
+    for t in wrap_text_to_width(TEXT_MEASURE, font.printable(title).strip(), font.at(PDF_TITLE[0]), max_width):
+        yield PDF_TITLE, t
+    yield (PDF_BODY[0], 10), ""
+    for _, md, plain in parse_itinerary(markdown_text).blocks():
+        yield from block_pdf_lines(md, plain, max_width)
+
+def build_pdf_bytes(markdown_text: str, title: str="NomadSquad Itinerary", stats=None):
+    W, H = PDF_PAGE
+    M = PDF_MARGIN
+
+    bio = io.BytesIO()
+    pdf = PdfWriter(bio, pdf_font(), page_size=PDF_PAGE, title=title)
+    page, y = pdf.new_page(), H - M
+    for (size, leading), text in pdf_lines(markdown_text, title, W - 2*M):
+        if y - leading < M:  # new page; the finished one goes straight into the buffer
+            pdf.add_page(page)
+            page, y = pdf.new_page(), H - M
+        y -= leading
+        if text: pdf.text(page, M, y, size, text)
+    pdf.add_page(page)
+    pdf.close()
+    if stats is not None: stats["pages"] = len(pdf.page_ids)
+
+    bio.seek(0)
+    return bio
+
+class PdfCache:
+    # finished PDFs (bounded LRU) plus the builds still running, keyed by (output hash, title)
+    def __init__(self, executor, max_items: int = 32, max_bytes: int = 64_000_000, build=None):
+        # build(markdown_text, title) -> bytes; defaults to build_pdf_bytes
+        self.executor, self.max_items, self.max_bytes = executor, max_items, max_bytes
+        self.build = build or (lambda md, title: build_pdf_bytes(md, title).getvalue())
+        self._done, self._running, self._failed = OrderedDict(), {}, {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "builds": 0, "evictions": 0, "failures": 0}
+
+    @staticmethod
+    def key(markdown_text: str, title: str):
+        return hashlib.sha256(markdown_text.encode("utf-8")).hexdigest(), title
+
+    def get(self, key):
+        with self._lock:
+            data = self._done.get(key)
+            if data is not None:
+                self._done.move_to_end(key)
+                self.stats["hits"] += 1
+            return data
+
+    def pending(self, key) -> bool:
+        with self._lock:
+            return key in self._running
+
+    def failed(self, key):
+        # -> why the last build for key failed, until the next request() retries it
+        with self._lock:
+            return self._failed.get(key)
+
+    def request(self, markdown_text: str, title: str) -> Future:
+        # joins a build already running for the same key instead of starting another
+        key = self.key(markdown_text, title)
+        with self._lock:
+            if key in self._done:
+                fut = Future()
+                fut.set_result(self._done[key])
+                return fut
+            if key not in self._running:
+                self._failed.pop(key, None)
+                self._running[key] = self.executor.submit(self._build, key, markdown_text, title)
+                self.stats["builds"] += 1
+            return self._running[key]
+
+    def _build(self, key, markdown_text, title):
+        try:
+            data = self.build(markdown_text, title)
+        except Exception as e:
+            with self._lock:
+                self._running.pop(key, None)
+                self._failed[key] = str(e) or type(e).__name__
+                self.stats["failures"] += 1
+            raise
+        with self._lock:
+            self._running.pop(key, None)
+            self._done[key] = data
+            self._bytes += len(data)
+            while len(self._done) > self.max_items or self._bytes > self.max_bytes:
+                _, old = self._done.popitem(last=False)
+                self._bytes -= len(old)
+                self.stats["evictions"] += 1
+        return data
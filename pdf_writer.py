@@ -0,0 +1,402 @@
+import os, struct, zlib
+
+# ======================
+# Small native PDF writer: real text operators, an embedded TrueType font,
+# pages streamed into the output one at a time (no page images kept around)
+# ======================
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",           # Debian/Ubuntu (fonts-dejavu-core)
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",                    # Fedora/Alpine
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf",
+    "/Library/Fonts/Arial.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+]
+
+# Helvetica advance widths (1/1000 em) for ASCII 32..126, from the standard AFM
+HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+
+class SizedFont:
+    # what the line breaker measures with; mirrors Pillow's font.getlength
+    __slots__ = ("font", "size")
+
+    def __init__(self, font, size):
+        self.font, self.size = font, size
+
+    def getlength(self, text: str) -> float:
+        return self.font.text_width(text) * self.size / 1000.0
+
+class _Measure:
+    # stands in for ImageDraw so wrap_text_to_width works unchanged
+    @staticmethod
+    def textlength(text, font):
+        return font.getlength(text)
+
+TEXT_MEASURE = _Measure()
+
+class StandardFont:
+    # Helvetica without embedding; only used when no TrueType font can be found
+    embedded = False
+
+    def __init__(self, name="Helvetica"):
+        self.name = name
+        self._sized = {}
+
+    def at(self, size):
+        # one SizedFont per size, so width caches keyed on it survive between exports
+        return self._sized.setdefault(size, SizedFont(self, size))
+
+    def glyph_run(self, text):
+        # -> [(code, char)] in WinAnsi; characters outside it are dropped
+        out = []
+        for ch in text:
+            try:
+                out.append((ch.encode("cp1252")[0], ch))
+            except UnicodeEncodeError:
+                continue
+        return out
+
+    def width(self, code: int) -> float:
+        return HELVETICA_WIDTHS[code - 32] if 32 <= code <= 126 else 556
+
+    def text_width(self, text: str) -> float:
+        return sum(self.width(code) for code, _ in self.glyph_run(text))
+
+    def printable(self, text: str) -> str:
+        return text.encode("cp1252", "ignore").decode("cp1252")
+
+class TrueTypeFont:
+    embedded = True
+
+    def __init__(self, path: str):
+        with open(path, "rb") as fh:
+            data = fh.read()
+        if data[:4] in (b"ttcf", b"OTTO"):
+            raise ValueError(f"{path}: need a single TrueType-outline .ttf")
+        tables = {}
+        for i in range(struct.unpack(">H", data[4:6])[0]):
+            tag, _, off, length = struct.unpack(">4sIII", data[12 + 16 * i:28 + 16 * i])
+            tables[tag.decode("latin-1")] = (off, length)
+        for need in ("head", "hhea", "maxp", "hmtx", "cmap", "glyf", "loca"):
+            if need not in tables: raise ValueError(f"{path}: missing '{need}' table")
+        self.data, self.path, self.tables = data, path, tables
+
+        head = tables["head"][0]
+        self.units = struct.unpack(">H", data[head + 18:head + 20])[0]
+        self.bbox = [self._scale(v) for v in struct.unpack(">hhhh", data[head + 36:head + 44])]
+        hhea = tables["hhea"][0]
+        ascent, descent = struct.unpack(">hh", data[hhea + 4:hhea + 8])
+        self.ascent, self.descent = self._scale(ascent), self._scale(descent)
+        n_hmetrics = struct.unpack(">H", data[hhea + 34:hhea + 36])[0]
+        num_glyphs = struct.unpack(">H", data[tables["maxp"][0] + 4:tables["maxp"][0] + 6])[0]
+        hmtx = tables["hmtx"][0]
+        adv = [struct.unpack(">H", data[hmtx + 4 * i:hmtx + 4 * i + 2])[0] for i in range(n_hmetrics)]
+        adv += [adv[-1]] * (num_glyphs - n_hmetrics)
+        self.advances = [self._scale(a) for a in adv]
+
+        self.cap_height = self.ascent
+        if "OS/2" in tables:
+            os2, length = tables["OS/2"]
+            if length >= 90 and struct.unpack(">H", data[os2:os2 + 2])[0] >= 2:
+                self.cap_height = self._scale(struct.unpack(">h", data[os2 + 88:os2 + 90])[0])
+        self.name = self._postscript_name(tables) or "NomadSquadSans"
+        self.cmap = self._read_cmap(tables["cmap"][0])
+        self._char_widths = {}
+        self._sized = {}
+
+    def _scale(self, v):
+        return round(v * 1000 / self.units)
+
+    def _postscript_name(self, tables):
+        if "name" not in tables: return None
+        base = tables["name"][0]
+        data = self.data
+        count, strings = struct.unpack(">HH", data[base + 2:base + 6])
+        for i in range(count):
+            platform, encoding, _, name_id, length, off = struct.unpack(">HHHHHH", data[base + 6 + 12 * i:base + 18 + 12 * i])
+            if name_id != 6: continue
+            raw = data[base + strings + off:base + strings + off + length]
+            name = raw.decode("utf-16-be" if platform in (0, 3) else "latin-1", "ignore")
+            name = "".join(c for c in name if c.isalnum() or c in "-_")
+            if name: return name
+        return None
+
+    def _read_cmap(self, base):
+        data = self.data
+        subtables = {}
+        for i in range(struct.unpack(">H", data[base + 2:base + 4])[0]):
+            platform, encoding, off = struct.unpack(">HHI", data[base + 4 + 8 * i:base + 12 + 8 * i])
+            subtables[(platform, encoding)] = base + off
+        for key in ((3, 10), (0, 4), (0, 6), (3, 1), (0, 3), (0, 1), (0, 0)):
+            if key not in subtables: continue
+            off = subtables[key]
+            fmt = struct.unpack(">H", data[off:off + 2])[0]
+            if fmt == 12: return self._cmap12(off)
+            if fmt == 4: return self._cmap4(off)
+        raise ValueError(f"{self.path}: no Unicode cmap")
+
+    def _cmap4(self, off):
+        data = self.data
+        seg2 = struct.unpack(">H", data[off + 6:off + 8])[0]
+        ends = off + 14
+        starts = ends + seg2 + 2
+        deltas = starts + seg2
+        ranges = deltas + seg2
+        out = {}
+        for s in range(seg2 // 2):
+            end, start = struct.unpack(">H", data[ends + 2 * s:ends + 2 * s + 2])[0], struct.unpack(">H", data[starts + 2 * s:starts + 2 * s + 2])[0]
+            delta = struct.unpack(">h", data[deltas + 2 * s:deltas + 2 * s + 2])[0]
+            ro_pos = ranges + 2 * s
+            ro = struct.unpack(">H", data[ro_pos:ro_pos + 2])[0]
+            for c in range(start, min(end, 0xFFFE) + 1):
+                if ro == 0:
+                    gid = (c + delta) & 0xFFFF
+                else:
+                    pos = ro_pos + ro + 2 * (c - start)
+                    gid = struct.unpack(">H", data[pos:pos + 2])[0]
+                    if gid: gid = (gid + delta) & 0xFFFF
+                if gid: out[c] = gid
+        return out
+
+    def _cmap12(self, off):
+        data = self.data
+        out = {}
+        for g in range(struct.unpack(">I", data[off + 12:off + 16])[0]):
+            start, end, gid = struct.unpack(">III", data[off + 16 + 12 * g:off + 28 + 12 * g])
+            for c in range(start, end + 1):
+                out[c] = gid + c - start
+        return out
+
+    def subset(self, gids) -> bytes:
+        # keeps glyph ids stable and empties every glyph that isn't used, so /W and
+        # ToUnicode still line up; only the tables a PDF renderer needs are kept
+        data, tables = self.data, self.tables
+        head = tables["head"][0]
+        num_glyphs = len(self.advances)
+        long_loca = struct.unpack(">h", data[head + 50:head + 52])[0] == 1
+        loca_off = tables["loca"][0]
+        if long_loca:
+            loca = struct.unpack(f">{num_glyphs + 1}I", data[loca_off:loca_off + 4 * (num_glyphs + 1)])
+        else:
+            loca = [2 * v for v in struct.unpack(f">{num_glyphs + 1}H", data[loca_off:loca_off + 2 * (num_glyphs + 1)])]
+        glyf = tables["glyf"][0]
+
+        keep, todo = set(), [0, *gids]
+        while todo:
+            g = todo.pop()
+            if g in keep or g >= num_glyphs: continue
+            keep.add(g)
+            start, end = glyf + loca[g], glyf + loca[g + 1]
+            if end - start < 10 or struct.unpack(">h", data[start:start + 2])[0] >= 0: continue
+            pos = start + 10  # composite glyph: pull in its components too
+            while True:
+                flags, comp = struct.unpack(">HH", data[pos:pos + 4])
+                todo.append(comp)
+                pos += 4 + (4 if flags & 0x1 else 2)
+                pos += 8 if flags & 0x80 else 4 if flags & 0x40 else 2 if flags & 0x8 else 0
+                if not flags & 0x20: break
+
+        new_glyf, new_loca = bytearray(), []
+        for g in range(num_glyphs):
+            new_loca.append(len(new_glyf))
+            if g in keep:
+                new_glyf += data[glyf + loca[g]:glyf + loca[g + 1]]
+                new_glyf += b"\0" * (-len(new_glyf) % 4)
+        new_loca.append(len(new_glyf))
+
+        new_head = bytearray(data[head:head + tables["head"][1]])
+        new_head[8:12] = b"\0\0\0\0"        # checksumAdjustment no longer valid
+        new_head[50:52] = struct.pack(">h", 1)  # long loca offsets
+        out = {"head": bytes(new_head), "loca": struct.pack(f">{len(new_loca)}I", *new_loca), "glyf": bytes(new_glyf)}
+        for tag in ("hhea", "maxp", "hmtx", "cvt ", "fpgm", "prep"):
+            if tag in tables:
+                off, length = tables[tag]
+                out[tag] = data[off:off + length]
+        return _sfnt(out)
+
+    def at(self, size):
+        return self._sized.setdefault(size, SizedFont(self, size))
+
+    def glyph_run(self, text):
+        # -> [(glyph id, char)]; characters the font can't draw (emoji etc.) are dropped
+        cmap = self.cmap
+        return [(cmap[ord(ch)], ch) for ch in text if ord(ch) in cmap]
+
+    def width(self, gid: int) -> float:
+        return self.advances[gid] if gid < len(self.advances) else 0
+
+    def printable(self, text: str) -> str:
+        # drops what the font can't draw (emoji, variation selectors) before layout
+        cmap = self.cmap
+        return "".join(ch for ch in text if (ord(ch) in cmap and not 0xFE00 <= ord(ch) <= 0xFE0F and ch != "\u200d")
+                       or ch == "\n")
+
+    def text_width(self, text: str) -> float:
+        widths, total = self._char_widths, 0
+        for ch in text:
+            w = widths.get(ch)
+            if w is None:
+                gid = self.cmap.get(ord(ch))
+                w = widths[ch] = self.width(gid) if gid else 0
+            total += w
+        return total
+
+def _checksum(b: bytes) -> int:
+    b += b"\0" * (-len(b) % 4)
+    return sum(struct.unpack(f">{len(b) // 4}I", b)) & 0xFFFFFFFF
+
+def _sfnt(tables: dict) -> bytes:
+    tags = sorted(tables)
+    n = len(tags)
+    entry = 1 << (n.bit_length() - 1)
+    header = struct.pack(">IHHHH", 0x00010000, n, entry * 16, entry.bit_length() - 1, n * 16 - entry * 16)
+    offset = 12 + 16 * n
+    directory, body = bytearray(), bytearray()
+    for tag in tags:
+        data = tables[tag]
+        directory += struct.pack(">4sIII", tag.encode("latin-1"), _checksum(data), offset + len(body), len(data))
+        body += data + b"\0" * (-len(data) % 4)
+    return header + bytes(directory) + bytes(body)
+
+def load_font(path: str = None):
+    # explicit path first, then common system fonts, then unembedded Helvetica
+    for candidate in ([path] if path else []) + FONT_CANDIDATES:
+        if candidate and os.path.exists(candidate):
+            try:
+                return TrueTypeFont(candidate)
+            except (ValueError, struct.error, OSError) as e:
+                print(f"⚠️ Skipping PDF font {candidate}: {e}")
+    return StandardFont()
+
+def _num(v) -> str:
+    return f"{v:.2f}".rstrip("0").rstrip(".") if isinstance(v, float) else str(v)
+
+def _literal(s: str) -> bytes:
+    raw = s.encode("cp1252", "ignore") if not isinstance(s, bytes) else s
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+def _utf16_hex(text: str) -> str:
+    return text.encode("utf-16-be").hex().upper()
+
+class PdfPage:
+    __slots__ = ("ops", "used")
+
+    def __init__(self):
+        self.ops, self.used = [], {}
+
+class PdfWriter:
+    CATALOG, PAGES, FONT, INFO = 1, 2, 3, 4
+
+    def __init__(self, out, font, page_size=(595.28, 841.89), title: str = "", compress: bool = True):
+        self.out, self.font, self.page_size, self.title, self.compress = out, font, page_size, title, compress
+        self.offsets = {}
+        self.next_id = 5
+        self.page_ids = []
+        self.used = {}  # glyph id / code -> char, for widths and ToUnicode
+        self._write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    # ---- low level
+    def _write(self, b: bytes):
+        self.out.write(b)
+
+    def _alloc(self) -> int:
+        self.next_id += 1
+        return self.next_id - 1
+
+    def _obj(self, num: int, body: bytes):
+        self.offsets[num] = self.out.tell()
+        self._write(f"{num} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    def _stream(self, num: int, data: bytes, extra: str = "", compress: bool = None):
+        if self.compress if compress is None else compress:
+            data = zlib.compress(data, 6)
+            extra += " /Filter /FlateDecode"
+        self._obj(num, f"<< /Length {len(data)}{extra} >>\nstream\n".encode() + data + b"\nendstream")
+
+    # ---- pages
+    def new_page(self) -> PdfPage:
+        return PdfPage()
+
+    def text(self, page: PdfPage, x: float, y: float, size: float, text: str):
+        run = self.font.glyph_run(text)
+        if not run: return
+        for code, ch in run: page.used[code] = ch
+        if self.font.embedded:
+            operand = ("<" + "".join(f"{gid:04X}" for gid, _ in run) + ">").encode()
+        else:
+            operand = _literal(bytes(code for code, _ in run))
+        page.ops.append(f"BT /F1 {_num(size)} Tf {_num(x)} {_num(y)} Td ".encode() + operand + b" Tj ET")
+
+    def add_page(self, page: PdfPage):
+        # written out immediately; only the glyph set survives the page
+        content, page_id = self._alloc(), self._alloc()
+        self._stream(content, b"\n".join(page.ops))
+        w, h = self.page_size
+        self._obj(page_id, (
+            f"<< /Type /Page /Parent {self.PAGES} 0 R /MediaBox [0 0 {_num(w)} {_num(h)}] "
+            f"/Resources << /Font << /F1 {self.FONT} 0 R >> >> /Contents {content} 0 R >>"
+        ).encode())
+        self.page_ids.append(page_id)
+        self.used.update(page.used)
+
+    # ---- fonts + trailer
+    def _write_font(self):
+        font = self.font
+        if not font.embedded:
+            self._obj(self.FONT, f"<< /Type /Font /Subtype /Type1 /BaseFont /{font.name} /Encoding /WinAnsiEncoding >>".encode())
+            return
+        cid, desc, file_id, tounicode = self._alloc(), self._alloc(), self._alloc(), self._alloc()
+        used = sorted(self.used)
+        # subset fonts get a six-letter tag in front of their name (PDF 32000 9.6.4)
+        tag = "".join(chr(65 + (zlib.crc32(bytes(str(used), "ascii")) >> (5 * i)) % 26) for i in range(6))
+        name = f"{tag}+{font.name}"
+        font_file = font.subset(used)
+        self._obj(self.FONT, (
+            f"<< /Type /Font /Subtype /Type0 /BaseFont /{name} /Encoding /Identity-H "
+            f"/DescendantFonts [{cid} 0 R] /ToUnicode {tounicode} 0 R >>"
+        ).encode())
+        widths = " ".join(f"{g} [{font.width(g)}]" for g in used)
+        self._obj(cid, (
+            f"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{name} "
+            f"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            f"/FontDescriptor {desc} 0 R /DW 1000 /W [{widths}] /CIDToGIDMap /Identity >>"
+        ).encode())
+        self._obj(desc, (
+            f"<< /Type /FontDescriptor /FontName /{name} /Flags 32 /FontBBox [{' '.join(map(str, font.bbox))}] "
+            f"/ItalicAngle 0 /Ascent {font.ascent} /Descent {font.descent} /CapHeight {font.cap_height} "
+            f"/StemV 80 /FontFile2 {file_id} 0 R >>"
+        ).encode())
+        self._stream(file_id, font_file, f" /Length1 {len(font_file)}", compress=True)
+        # ToUnicode keeps the text selectable and searchable
+        lines = ["/CIDInit /ProcSet findresource begin", "12 dict begin", "begincmap",
+                 "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+                 "/CMapName /Adobe-Identity-UCS def", "/CMapType 2 def",
+                 "1 begincodespacerange", "<0000> <FFFF>", "endcodespacerange"]
+        for i in range(0, len(used), 100):
+            chunk = used[i:i + 100]
+            lines.append(f"{len(chunk)} beginbfchar")
+            lines += [f"<{g:04X}> <{_utf16_hex(self.used[g])}>" for g in chunk]
+            lines.append("endbfchar")
+        lines += ["endcmap", "CMapName currentdict /CMap defineresource pop", "end", "end"]
+        self._stream(tounicode, "\n".join(lines).encode())
+
+    def close(self):
+        self._write_font()
+        kids = " ".join(f"{p} 0 R" for p in self.page_ids)
+        self._obj(self.PAGES, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode())
+        self._obj(self.CATALOG, f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>".encode())
+        self._obj(self.INFO, b"<< /Title <FEFF" + _utf16_hex(self.title).encode() + b"> /Producer (NomadSquad) >>")
+        xref = self.out.tell()
+        size = self.next_id
+        rows = [b"xref\n", f"0 {size}\n".encode(), b"0000000000 65535 f \n"]
+        rows += [f"{self.offsets.get(n, 0):010d} 00000 n \n".encode() for n in range(1, size)]
+        self._write(b"".join(rows))
+        self._write(f"trailer\n<< /Size {size} /Root {self.CATALOG} 0 R /Info {self.INFO} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
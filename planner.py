@@ -0,0 +1,489 @@
+import hashlib, json, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11; streamlit already depends on toml
+    import toml as tomllib
+
+from itinerary_cache import ItineraryCache, trip_cache_key
+from admission import AdmissionController, SharedLimits, QueueFull, QueueTimeout, Abandoned
+from long_trip import LONG_TRIP_DAYS, generate_long_trip
+from pdf_export import PdfCache, build_pdf_bytes
+from rates import RATES_URL, RateTable, fetch_latest
+from http_client import HttpClient, Policy, CircuitOpen
+from jobs import JobStore
+from link_index import LinkIndex
+from metrics import Metrics, TOKENS, BYTES, PAGES
+
+# ======================
+# Planning core shared by the Streamlit page and the batch CLI (no UI imports here)
+# ======================
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+SETTINGS = (
+    "GEMINI_API_KEY", "PPLX_API_KEY", "EXCHANGE_RATE_API_KEY", "EXCHANGE_RATE_BASE", "EXCHANGE_RATE_TTL_MIN",
+    "CACHE_DIR", "ITINERARY_CACHE_MAX_ENTRIES", "ITINERARY_CACHE_TTL_HOURS", "LONG_TRIP_PARALLEL",
+    "GEMINI_MAX_CONCURRENT", "GEMINI_RATE_PER_S", "GEMINI_BURST", "GEMINI_MAX_QUEUE", "GEMINI_SHARED_LIMITS",
+    "GEMINI_MODELS", "GEMINI_HEDGE", "GEMINI_HEDGE_MIN_S", "PPLX_READ_TIMEOUT_S", "BREAKER_THRESHOLD",
+    "BREAKER_RESET_S", "JOB_WORKERS", "JOB_TTL_MIN", "PDF_CACHE_MAX_ITEMS", "LINK_INDEX_TTL_HOURS",
+    "LINK_INDEX_SIMILAR_TTL_HOURS", "LINK_INDEX_MAX_QUERIES", "METRICS_EXPORT_PATH", "METRICS_EXPORT_S",
+    "PPLX_URL", "EXCHANGE_RATE_URL",
+)
+
+def load_settings(path: str = SECRETS_PATH) -> dict:
+    # secrets.toml, then environment variables of the same name on top (JSON-decoded when they parse)
+    settings = {}
+    if os.path.exists(path):
+        if tomllib.__name__ == "tomllib":
+            with open(path, "rb") as f: settings = tomllib.load(f)
+        else:
+            with open(path, encoding="utf-8") as f: settings = tomllib.load(f)
+    for name in SETTINGS:
+        if name in os.environ:
+            try: settings[name] = json.loads(os.environ[name])
+            except ValueError: settings[name] = os.environ[name]
+    return settings
+
+# ✅ UPDATED: Using your available Gemini 3 Flash model
+# This is the best balance of speed and intelligence for your app right now.
+GEMINI_MODEL = "models/gemini-3-flash-preview"
+
+GEMINI_CONFIG = {
+    "max_output_tokens": 4096,  # Increased for detailed itineraries
+    "temperature": 0.7,
+    "top_p": 0.9
+}
+
+# Safety settings to prevent blocking of travel content
+GEMINI_SAFETY = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+]
+
+PPLX_URL = "https://api.perplexity.ai/chat/completions"
+
+PLAN_DEADLINE_S = 75  # one end-to-end budget for Gemini + Perplexity together
+BUSY_MESSAGE = "NomadSquad is swamped right now, please try again in a minute."
+DEADLINE_MESSAGE = f"Gemini didn't get to this trip within {PLAN_DEADLINE_S}s, please try again in a minute."
+
+def timed_call(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - t0
+
+def remaining(deadline: float) -> float:
+    return max(0.0, deadline - time.perf_counter())
+
+# ======================
+# Process-wide services, built on first use
+# ======================
+class Services:
+    def __init__(self, settings):
+        # settings: anything with .get (st.secrets, or load_settings() for scripts)
+        self.settings = settings
+        self.gemini_api_key = settings.get("GEMINI_API_KEY")
+        self.pplx_api_key = settings.get("PPLX_API_KEY")
+        self.exchange_rate_api_key = settings.get("EXCHANGE_RATE_API_KEY")
+        # upstream endpoints can be pointed elsewhere (a proxy, or the benchmark stubs)
+        self.pplx_url = settings.get("PPLX_URL", PPLX_URL)
+        self.exchange_rate_url = settings.get("EXCHANGE_RATE_URL", RATES_URL)
+        self.cache_dir = settings.get("CACHE_DIR", ".nomadsquad_cache")
+        self.long_trip_parallel = int(settings.get("LONG_TRIP_PARALLEL", 4))
+        self._built = {}
+        self._lock = threading.RLock()
+
+    def _once(self, name, build):
+        with self._lock:
+            if name not in self._built: self._built[name] = build()
+            return self._built[name]
+
+    @property
+    def metrics(self):
+        # METRICS_EXPORT_PATH: *.prom for a Prometheus textfile collector, anything else gets JSON
+        def build():
+            m = Metrics()
+            m.collect(self.component_stats)
+            path = self.settings.get("METRICS_EXPORT_PATH")
+            if path: m.export_every(path, float(self.settings.get("METRICS_EXPORT_S", 15)))
+            return m
+        return self._once("metrics", build)
+
+    def component_stats(self) -> dict:
+        # counters of whatever has been built so far; never builds anything just to report on it
+        with self._lock: built = dict(self._built)
+        out = {}
+        for name in ("itinerary_cache", "admission", "job_store", "link_index"):
+            if name in built: out[name] = built[name].stats()
+        for name in ("pdf_cache", "rate_table"):
+            if name in built: out[name] = dict(built[name].stats)
+        if "rate_table" in built: out["rate_table"]["age_s"] = built["rate_table"].age_s()
+        return out
+
+    @property
+    def worker_pool(self):
+        # shared across sessions; upstream calls run here so they overlap instead of queueing
+        return self._once("worker_pool", lambda: ThreadPoolExecutor(max_workers=8, thread_name_prefix="nomadsquad"))
+
+    @property
+    def itinerary_cache(self):
+        return self._once("itinerary_cache", lambda: ItineraryCache(
+            os.path.join(self.cache_dir, "itineraries.sqlite"),
+            max_entries=int(self.settings.get("ITINERARY_CACHE_MAX_ENTRIES", 500)),
+            ttl_s=float(self.settings.get("ITINERARY_CACHE_TTL_HOURS", 7 * 24)) * 3600,
+        ))
+
+    @property
+    def admission(self):
+        # one controller per process: every session's Gemini calls queue here. The rate and concurrency
+        # limits live in CACHE_DIR, so the page and batch runs on the same cache dir share them
+        def build():
+            max_concurrent = int(self.settings.get("GEMINI_MAX_CONCURRENT", 4))
+            rate_per_s = float(self.settings.get("GEMINI_RATE_PER_S", 2.0))
+            burst = int(self.settings.get("GEMINI_BURST", 4))
+            shared = SharedLimits(os.path.join(self.cache_dir, "limits.sqlite"), rate_per_s, burst, max_concurrent) \
+                if self.settings.get("GEMINI_SHARED_LIMITS", True) else None
+            return AdmissionController(max_concurrent=max_concurrent, rate_per_s=rate_per_s, burst=burst,
+                                       max_queue=int(self.settings.get("GEMINI_MAX_QUEUE", 32)), shared=shared)
+        return self._once("admission", build)
+
+    @property
+    def job_store(self):
+        # generation runs here, off the script thread, so reruns and tab switches don't lose it
+        return self._once("job_store", lambda: JobStore(
+            max_workers=int(self.settings.get("JOB_WORKERS", 4)),
+            ttl_s=float(self.settings.get("JOB_TTL_MIN", 15)) * 60,
+        ))
+
+    @property
+    def pdf_cache(self):
+        # PDFs are only built when asked for, once per (plan, title), on the shared pool
+        return self._once("pdf_cache", lambda: PdfCache(
+            self.worker_pool, max_items=int(self.settings.get("PDF_CACHE_MAX_ITEMS", 32)),
+            build=lambda md, title: build_pdf(self, md, title),
+        ))
+
+    @property
+    def link_index(self):
+        # researched links outlive the session; repeat destinations skip Perplexity entirely
+        return self._once("link_index", lambda: LinkIndex(
+            os.path.join(self.cache_dir, "links.sqlite"),
+            ttl_s=float(self.settings.get("LINK_INDEX_TTL_HOURS", 72)) * 3600,
+            similar_ttl_s=float(self.settings.get("LINK_INDEX_SIMILAR_TTL_HOURS", 24)) * 3600,
+            max_queries=int(self.settings.get("LINK_INDEX_MAX_QUERIES", 2000)),
+        ))
+
+    @property
+    def http(self):
+        # keep-alive pools and breakers shared by every session; one policy per upstream
+        return self._once("http", lambda: HttpClient({
+            "pplx": Policy(read_s=float(self.settings.get("PPLX_READ_TIMEOUT_S", 30)), retries=1),
+            "rates": Policy(read_s=6.0, retries=2),
+            "gemini": Policy(retries=0, trip_on_throttle=False),  # the admission controller already paces and retries Gemini
+        }, threshold=int(self.settings.get("BREAKER_THRESHOLD", 5)),
+           reset_s=float(self.settings.get("BREAKER_RESET_S", 30)),
+           on_event=lambda name, **labels: self.metrics.inc(name, **labels)))
+
+    @property
+    def rate_table(self):
+        # one USD snapshot serves every pair; the budget widget never waits on the network
+        def fetch():
+            with self.metrics.span("exchange_rate_fetch"):
+                return fetch_latest(self.exchange_rate_api_key, self.settings.get("EXCHANGE_RATE_BASE", "USD"), self.http,
+                                    self.exchange_rate_url)
+        return self._once("rate_table", lambda: RateTable(
+            fetch,
+            os.path.join(self.cache_dir, "rates.json"),
+            self.worker_pool,
+            ttl_s=float(self.settings.get("EXCHANGE_RATE_TTL_MIN", 60)) * 60,
+        ))
+
+    @property
+    def router(self):
+        # configured once and kept warm; GEMINI_MODELS lists fallbacks, fastest healthy one wins
+        def build():
+            import google.generativeai as genai
+            from gemini_client import GeminiRouter
+            return GeminiRouter(
+                genai, self.gemini_api_key, self.settings.get("GEMINI_MODELS") or [GEMINI_MODEL],
+                hedge=bool(self.settings.get("GEMINI_HEDGE", False)),
+                hedge_min_s=float(self.settings.get("GEMINI_HEDGE_MIN_S", 8)),
+                generation_config=GEMINI_CONFIG, safety_settings=GEMINI_SAFETY,
+                hedge_budget=self.admission.bucket.try_take,  # hedges spend the same Gemini rate limit
+            )
+        return self._once("router", build)
+
+# ======================
+# PROMPT (funny + lingo + month packing)
+# ======================
+TRIP_FIELDS = ("destination", "duration", "people", "budget_dest_currency", "dest_currency_code", "travel_vibe",
+               "accommodation", "pace", "origin_country", "origin_city", "transport_to_dest", "travel_month",
+               "food_prefs", "transport_prefs_local", "special_requests")
+
+def build_prompt(destination, duration, people, budget_dest_currency, dest_currency_code, travel_vibe, accommodation, pace,
+                 origin_country, origin_city, transport_to_dest, travel_month, food_prefs, transport_prefs_local, special_requests):
+    accomm_str = ", ".join(accommodation) if accommodation else "Any suitable"
+    vibe_str   = ", ".join(travel_vibe) if travel_vibe else "General Tourist"
+    food_str   = ", ".join(food_prefs) if food_prefs else "No specific preferences"
+    prompt = (
+        f"You are NomadSquad, an adventurous, witty, emoji-loving travel planner. Lean funny and friendly.\n"
+        f"Add plenty of destination lingo and local slang with brief meanings (5–10 phrases sprinkled naturally).\n"
+        f"Include playful jokes and hype, but stay practical and accurate.\n"
+        f"--- TRIP INPUTS ---\n"
+        f"Origin: {origin_city}, {origin_country}\n"
+        f"Destination: {destination}\n"
+        f"Month: {travel_month}\n"
+        f"Duration: {duration} days\n"
+        f"People: {people}\n"
+        f"Daily Budget (per person): {budget_dest_currency:.0f} {dest_currency_code}\n"
+        f"Arrival: {transport_to_dest}\n"
+        f"Stay: {accomm_str}\n"
+        f"Vibe: {vibe_str}\n"
+        f"Pace: {pace}\n"
+        f"Food: {food_str}\n"
+        f"Local Transport Pref: {transport_prefs_local}\n"
+        f"Requests: {special_requests or 'None'}\n"
+        f"--- RULES ---\n"
+        f"1) In the OVERVIEW, give seasonal/weather context for {destination} in {travel_month} (°C), "
+        f"and a concise PACKING LIST tailored to the season (e.g., rain gear in monsoon, layers in winter, sunscreen in summer).\n"
+        f"2) DAILY ITINERARY: Write a vivid day-by-day plan (**Day 1**, **Day 2**, ...). Blend vibes & requests; be descriptive and fun.\n"
+        f"3) TIPS: Include arrival & local transport guidance, safety, budget hacks, and a 'Local Lingo' mini-glossary "
+        f"(5–10 short entries: phrase = meaning + when to use).\n"
+        f"4) FOOD: Suggest specific eateries/dishes respecting preferences; add price hints in {dest_currency_code}.\n"
+        f"5) ACCOMMODATION: Suggest 1–2 options that match style & budget with brief WHY they fit.\n"
+        f"6) Keep it structured EXACTLY in these headings:\n"
+        f"### 🎉 Your NomadSquad Trip Overview & Seasonal Intel! 🎉\n"
+        f"### 🗺️ Your Awesome {duration}-Day Adventure Itinerary! 🗺️\n"
+        f"### ✨ NomadSquad's Pro Tips & Essential Info! ✨\n"
+        f"End each section with one fun one-liner in local flavor."
+    )
+    return prompt
+
+def plan_cache_key(trip_inputs) -> str:
+    return trip_cache_key(*trip_inputs, namespace=GEMINI_MODEL)
+
+def research_query(destination, accommodation, min_rating=4.2, must_have=()) -> str:
+    return f"{destination} best {(', '.join(accommodation) or 'hotels')} near top sights, " \
+           f"booking pages and review links; min rating {min_rating}; must-have {', '.join(must_have) or 'none'}"
+
+# ======================
+# Upstream calls
+# ======================
+def pplx_research(svc: Services, query: str, model: str = "sonar-pro", k: int = 8):
+    if not svc.pplx_api_key: return "", []
+    headers = {"Authorization": f"Bearer {svc.pplx_api_key}", "Content-Type":"application/json"}
+    payload = {
+        "model": model,  # "sonar-pro" (fast) or "sonar-deep-research" (deeper)
+        "messages": [
+            {"role":"system","content":"Be precise, add trustworthy links (official or major OTAs), concise bullets."},
+            {"role":"user","content": f"Find high-quality booking pages and review links: {query}. Prefer official hotel sites or major OTAs. 6–8 best links."}
+        ],
+        "temperature": 0.2,
+        "top_p": 0.9,
+        "max_tokens": 1200
+    }
+    try:
+        with svc.metrics.span("perplexity"):
+            js = svc.http.post("pplx", svc.pplx_url, headers=headers, json=payload).json()
+        text = js["choices"][0]["message"]["content"]
+        results = js.get("search_results", []) or []
+        links = []
+        for it in results[:k]:
+            links.append({"title": it.get("title","Link"), "url": it.get("url","#"), "date": it.get("date","")})
+        return text, links
+    except CircuitOpen:
+        return "", []  # Perplexity is down; skip research instead of waiting out the timeout
+    except Exception as e:
+        # runs on a worker thread, so log instead of writing to the page
+        print(f"⚠️ Perplexity research unavailable: {e}")
+        return "", []
+
+def research_links(svc: Services, destination, accommodation, min_rating=4.2, must_have=(), k: int = 8):
+    # -> (source, links); the local index answers first, Perplexity only on a miss
+    t0 = time.perf_counter()
+    found = svc.link_index.lookup(destination, accommodation, min_rating, must_have, k)
+    svc.metrics.inc("cache_lookups", cache="links", result="miss" if found is None else "hit")
+    if found is not None:
+        svc.metrics.observe("links", time.perf_counter() - t0, source="index")
+        return "index", found
+    _, links = pplx_research(svc, research_query(destination, accommodation, min_rating, must_have), k=k)
+    svc.link_index.store(destination, accommodation, min_rating, must_have, links)
+    svc.metrics.observe("links", time.perf_counter() - t0, bool(links), source="perplexity")
+    return "perplexity", links
+
+def cached_plan(svc: Services, cache_key: str):
+    text = svc.itinerary_cache.get(cache_key)
+    svc.metrics.inc("cache_lookups", cache="itinerary", result="hit" if text else "miss")
+    return text
+
+def debug_list_models(svc: Services, e):
+    # Debug block kept in case you ever need to check models again (cached list, no extra round-trip)
+    model = getattr(e, "gemini_model", None)
+    print(f"❌ Error with model '{model}': {e}" if model else f"❌ Gemini request failed before reaching a model: {e}")
+    models = svc.router.cached_models()
+    if models:
+        print("🔍 Models available for your key:")
+        for name in models: print(f"   - {name}")
+
+def record_usage(svc: Services, usage):
+    # usage_metadata from a response (or the last stream chunk): token counts per call
+    if usage is None: return
+    for kind, field in (("prompt", "prompt_token_count"), ("output", "candidates_token_count")):
+        n = getattr(usage, field, None)
+        if n: svc.metrics.record("gemini_tokens", n, TOKENS, kind=kind)
+
+def flight_key(prompt: str) -> str:
+    return hashlib.sha256(f"{GEMINI_MODEL}\n{prompt}".encode("utf-8")).hexdigest()
+
+def make_gemini_itinerary(svc: Services, prompt, on_wait=None, deadline=None):
+    def generate(policy=None):
+        with svc.metrics.span("gemini"):
+            resp, _ = svc.router.generate(prompt, timeout=remaining(deadline) if deadline is not None else None)
+        record_usage(svc, getattr(resp, "usage_metadata", None))
+
+        if not resp or not getattr(resp, "text", None):
+            return None, "Empty response from Gemini."
+
+        return resp.text.strip(), None
+
+    try:
+        return svc.admission.run(flight_key(prompt), lambda: svc.http.guard("gemini", generate), on_wait, deadline)
+    except QueueTimeout:
+        return None, DEADLINE_MESSAGE
+    except QueueFull:
+        return None, BUSY_MESSAGE
+    except Exception as e:
+        debug_list_models(svc, e)
+        return None, f"Gemini request failed: {e}"
+
+def long_trip_generator(svc: Services, deadline=None):
+    return lambda p: make_gemini_itinerary(svc, p, deadline=deadline)
+
+def stream_gemini_itinerary(svc: Services, prompt, deadline=None):
+    # yields text chunks as Gemini writes them; errors propagate to the caller
+    usage = None
+    extra = {"request_options": {"timeout": remaining(deadline)}} if deadline is not None else {}
+    for chunk in svc.router.stream(prompt, **extra):
+        usage = getattr(chunk, "usage_metadata", None) or usage
+        try:
+            text = chunk.text
+        except ValueError:  # chunk carries only finish/safety metadata
+            continue
+        if text: yield text
+    record_usage(svc, usage)
+
+# ---------- Splitting the itinerary into its three headings (see build_prompt)
+SECTION_MARKERS = ("### 🎉", "### 🗺️", "### ✨")
+
+class SectionStream:
+    # incremental heading split for a plan that is still arriving: remembers where each heading starts,
+    # so every chunk only scans the text that just arrived
+    def __init__(self):
+        self.text = ""
+        self.pos = [-1, -1, -1]
+
+    def feed(self, chunk: str):
+        scan_from = max(0, len(self.text) - 8)  # a heading may straddle two chunks
+        self.text += chunk
+        if self.pos[0] < 0:
+            self.pos[0] = self.text.find(SECTION_MARKERS[0], scan_from)
+        if self.pos[1] < 0:
+            self.pos[1] = self.text.find(SECTION_MARKERS[1], scan_from)
+        if self.pos[1] >= 0 and self.pos[2] < 0:
+            self.pos[2] = self.text.find(SECTION_MARKERS[2], max(scan_from, self.pos[1]))
+
+    def sections(self):
+        head, mid, tail = self.pos
+        if mid < 0:
+            return (self.text[head + len(SECTION_MARKERS[0]):] if head >= 0 else self.text), "", ""
+        overview = self.text[:mid].split(SECTION_MARKERS[0], 1)[-1]
+        if tail < 0:
+            return overview, self.text[mid:], ""
+        return overview, self.text[mid:tail], self.text[tail:]
+
+def stream_itinerary(svc: Services, prompt, deadline, timings, on_sections, on_wait=None, cancelled=None):
+    # hands each section to on_sections as soon as its text arrives
+    t0 = time.perf_counter()
+
+    def produce(policy=None):
+        parser = SectionStream()
+        err = None
+        t_call = time.perf_counter()
+        try:
+            for chunk in stream_gemini_itinerary(svc, prompt, deadline):
+                if "first_content" not in timings:
+                    timings["first_content"] = time.perf_counter() - timings.get("start", t0)
+                parser.feed(chunk)
+                on_sections(parser.sections())
+                if cancelled and cancelled():
+                    # a partial plan must not reach sessions sharing this flight; one of them takes over
+                    raise Abandoned("cancelled")
+                if not remaining(deadline):
+                    err = f"stopped after {PLAN_DEADLINE_S}s, showing what was written so far"
+                    break
+        except Abandoned:
+            raise
+        except Exception as e:
+            svc.metrics.observe("gemini_stream", time.perf_counter() - t_call, False)
+            if not parser.text: raise  # nothing shown yet, so the controller may retry
+            err = f"stream interrupted ({e}), showing what was written so far"
+        else:
+            svc.metrics.observe("gemini_stream", time.perf_counter() - t_call)
+        text = parser.text.strip()
+        if not text: return None, err or "Empty response from Gemini."
+        return text, err
+
+    try:
+        text, err = svc.admission.run(flight_key(prompt), lambda: svc.http.guard("gemini", produce), on_wait, deadline)
+    except Abandoned:
+        text, err = None, "cancelled"
+    except QueueTimeout:
+        text, err = None, DEADLINE_MESSAGE
+    except QueueFull:
+        text, err = None, BUSY_MESSAGE
+    except Exception as e:
+        debug_list_models(svc, e)
+        text, err = None, f"Gemini request failed: {e}"
+    timings["gemini"] = time.perf_counter() - t0
+    timings.setdefault("first_content", timings["gemini"])
+    return text, err
+
+def generate_itinerary(svc: Services, prompt, duration, cache_key, deadline, timings, stream=False,
+                       note=None, on_sections=None, on_progress=None, cancelled=None):
+    # -> (text, err, long_trip_plan); err next to text is a warning, err alone a failure. Caches complete plans.
+    note = note or (lambda msg: None)
+    cancelled = cancelled or (lambda: False)
+    plan = None
+    t0 = time.perf_counter()
+    if duration > LONG_TRIP_DAYS:
+        # one answer can't hold a long trip: skeleton first, then day blocks in parallel
+        note("🧭 Sketching the big picture...")
+        generate = long_trip_generator(svc, deadline)
+        text, err, plan = generate_long_trip(
+            prompt, duration, lambda p: (None, "cancelled") if cancelled() else generate(p),
+            max_parallel=svc.long_trip_parallel, deadline=deadline, on_progress=on_progress
+        )
+        timings["gemini"] = timings["first_content"] = time.perf_counter() - t0
+        if plan: plan["cache_key"] = cache_key
+        cacheable = text and not plan["failed"]
+    elif stream:
+        text, err = stream_itinerary(svc, prompt, deadline, timings, on_sections or (lambda secs: None), note, cancelled)
+        cacheable = text and not err  # partial plans are never cached
+    else:
+        (text, err), timings["gemini"] = timed_call(make_gemini_itinerary, svc, prompt, note, deadline)
+        timings["first_content"] = timings["gemini"]
+        cacheable = bool(text)
+    if cacheable and not cancelled(): svc.itinerary_cache.put(cache_key, text)
+    svc.metrics.observe("itinerary", time.perf_counter() - t0, bool(text),
+                        mode="long" if plan else "stream" if stream else "single")
+    if timings.get("first_content") is not None: svc.metrics.observe("first_content", timings["first_content"])
+    return text, err, plan
+
+def build_pdf(svc: Services, markdown_text: str, title: str) -> bytes:
+    info = {}
+    with svc.metrics.span("build_pdf"):
+        data = build_pdf_bytes(markdown_text, title, info).getvalue()
+    svc.metrics.record("pdf_pages", info["pages"], PAGES)
+    svc.metrics.record("pdf_bytes", len(data), BYTES)
+    return data
@@ -0,0 +1,86 @@
+import json, os, threading, time
+import requests
+
+# ======================
+# One /latest/{base} snapshot -> every currency pair as a cross-rate,
+# refreshed in the background and kept on disk for offline-safe startup
+# ======================
+RATES_URL = "https://v6.exchangerate-api.com/v6/{key}/latest/{base}"
+
+def fetch_latest(api_key: str, base: str = "USD", client=None, url_template: str = RATES_URL) -> dict:
+    # client: an http_client.HttpClient; plain requests only for one-off scripts
+    url = url_template.format(key=api_key, base=base)
+    if client is not None:
+        r = client.get("rates", url)
+    else:
+        r = requests.get(url, timeout=6)
+        r.raise_for_status()
+    data = r.json()
+    if data.get("result") != "success":
+        raise ValueError(data.get("error-type") or "exchange rate API returned no rates")
+    return {"base": data.get("base_code", base), "rates": data["conversion_rates"], "fetched": time.time()}
+
+class RateTable:
+    def __init__(self, fetch, snapshot_path: str, executor, ttl_s: float = 3600, retry_s: float = 60):
+        # fetch() -> {"base", "rates", "fetched"}; runs on executor, never on the script thread
+        self.fetch, self.path, self.executor = fetch, snapshot_path, executor
+        self.ttl_s, self.retry_s = ttl_s, retry_s
+        self._lock = threading.Lock()
+        self._snap = self._load()
+        self._refreshing = False
+        self._last_try = 0.0
+        self.last_error = None
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                snap = json.load(f)
+            return snap if snap.get("rates") else None
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, snap):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snap, f)
+        os.replace(tmp, self.path)  # readers never see a half-written file
+
+    def _refresh(self):
+        try:
+            snap = self.fetch()
+            with self._lock:
+                self._snap, self.last_error = snap, None
+                self.stats["refreshes"] += 1
+            self._save(snap)
+        except Exception as e:
+            with self._lock:
+                self.last_error = str(e)
+                self.stats["refresh_errors"] += 1
+        finally:
+            with self._lock: self._refreshing = False
+
+    def maybe_refresh(self):
+        # stale-while-revalidate: callers keep the old snapshot while one refresh runs
+        now = time.time()
+        with self._lock:
+            fresh = self._snap and now - self._snap["fetched"] < self.ttl_s
+            if fresh or self._refreshing or now - self._last_try < self.retry_s:
+                return
+            self._refreshing, self._last_try = True, now
+        self.executor.submit(self._refresh)
+
+    def age_s(self):
+        with self._lock:
+            return time.time() - self._snap["fetched"] if self._snap else None
+
+    def rate(self, home: str, dest: str):
+        # -> units of dest per 1 home, or None until the first snapshot lands
+        self.maybe_refresh()
+        if home == dest: return 1.0
+        with self._lock:
+            rates = self._snap["rates"] if self._snap else {}
+            hit = home in rates and dest in rates and bool(rates[home])
+            self.stats["hits" if hit else "misses"] += 1
+        return rates[dest] / rates[home] if hit else None